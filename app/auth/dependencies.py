@@ -1,9 +1,9 @@
 from typing import Optional
 from fastapi import Depends, HTTPException, status, Request, Cookie
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, joinedload
 
 from app.db.session import get_db
-from app.db.models import User, Role
+from app.db.models import User
 from app.core.security import verify_token
 
 def get_current_user(
@@ -37,8 +37,8 @@ def get_current_user(
             detail="Invalid token payload"
         )
     
-    # Buscar usuario en base de datos
-    user = db.query(User).filter(User.id == user_id).first()
+    # Buscar usuario en base de datos (con su rol, para no volver a consultarlo)
+    user = db.query(User).options(joinedload(User.role)).filter(User.id == user_id).first()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -62,19 +62,16 @@ def get_current_active_user(
 def require_role(required_role: str):
     """Dependency factory para requerir un rol específico"""
     def role_checker(
-        current_user: User = Depends(get_current_active_user),
-        db: Session = Depends(get_db)
+        current_user: User = Depends(get_current_active_user)
     ) -> User:
-        # Cargar rol del usuario
-        user_with_role = db.query(User).join(Role).filter(User.id == current_user.id).first()
-        
-        if not user_with_role or user_with_role.role.name != required_role:
+        # El rol ya viene cargado desde get_current_user
+        if not current_user.role or current_user.role.name != required_role:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail=f"Role '{required_role}' required"
             )
         
-        return user_with_role
+        return current_user
     
     return role_checker
 
@@ -108,8 +105,8 @@ def get_current_user_optional(
         if not user_id:
             return None
         
-        # Buscar usuario en base de datos
-        user = db.query(User).filter(User.id == user_id).first()
+        # Buscar usuario en base de datos (con su rol, para no volver a consultarlo)
+        user = db.query(User).options(joinedload(User.role)).filter(User.id == user_id).first()
         if not user or not user.is_active:
             return None
         
@@ -71,14 +71,14 @@ async def debug_cors(request: Request):
     }
 
 @router.get("/session")
-async def session(request: Request, current_user: User | None = Depends(get_current_user_optional), db: Session = Depends(get_db)):
+async def session(request: Request, current_user: User | None = Depends(get_current_user_optional)):
     """Endpoint idempotente que devuelve 200 siempre.
     Sirve para que el frontend obtenga estado de sesión sin disparar 401 cuando el usuario es anónimo.
     """
     if not current_user:
         return {"authenticated": False}
-    # Cargar rol completo
-    user_with_role = db.query(User).join(Role).filter(User.id == current_user.id).first()
+    # El rol ya viene cargado desde get_current_user_optional
+    user_with_role = current_user
     return {
         "authenticated": True,
         "user": {
@@ -235,12 +235,11 @@ async def refresh_token(
 
 @router.get("/me", response_model=UserInfo)
 async def get_current_user_info(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user)
 ):
     """Obtener información del usuario actual"""
-    # Cargar rol del usuario
-    user_with_role = db.query(User).join(Role).filter(User.id == current_user.id).first()
+    # El rol ya viene cargado desde get_current_user
+    user_with_role = current_user
     
     return UserInfo(
         id=user_with_role.id,
@@ -371,10 +371,10 @@ async def upload_featured_image(
         if not file.content_type or not file.content_type.startswith('image/'):
             raise HTTPException(status_code=400, detail="Solo se permiten archivos de imagen")
 
-        # Leer contenido para validar tamaño de forma segura (máximo 5MB)
-        file_content = await file.read()
+        # Validar tamaño (máximo 5MB) sin leer el archivo: Starlette ya lo tiene
+        # en su archivo temporal y conoce el tamaño
         max_bytes = 5 * 1024 * 1024
-        if len(file_content) > max_bytes:
+        if file.size is not None and file.size > max_bytes:
             raise HTTPException(status_code=400, detail="La imagen no puede ser mayor a 5MB")
 
         # Limpiar nombre del archivo (remover espacios y caracteres especiales)
@@ -387,7 +387,7 @@ async def upload_featured_image(
         
         success, error = await r2_service.upload_file_to_public_bucket(
             object_key=object_key,
-            content=file_content,
+            content=file.file,
             content_type=file.content_type
         )
         
@@ -402,7 +402,7 @@ async def upload_featured_image(
             "object_key": object_key,
             "filename": clean_filename,
             "content_type": file.content_type,
-            "size": len(file_content)
+            "size": file.size
         }
         
     except Exception as e:
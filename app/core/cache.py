@@ -0,0 +1,91 @@
+import logging
+from typing import Optional
+
+from app.core.config import settings
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+
+
+class RedisCache:
+    """Cache compartido entre workers sobre Redis.
+
+    Si REDIS_URL no está configurado (o el cliente no se puede crear) queda
+    deshabilitado y todas las operaciones son no-ops: el caller siempre
+    recalcula el valor. Los errores de Redis nunca se propagan a la request.
+    """
+
+    def __init__(self):
+        url = (settings.REDIS_URL or "").strip()
+
+        if url:
+            try:
+                import redis
+
+                self.client = redis.Redis.from_url(
+                    url,
+                    decode_responses=True,
+                    socket_timeout=0.5,
+                    socket_connect_timeout=0.5,
+                )
+                self.enabled = True
+                logger.info("Redis cache initialized")
+            except Exception:
+                self.client = None
+                self.enabled = False
+                logger.exception("Failed to initialize Redis client; cache disabled")
+        else:
+            self.client = None
+            self.enabled = False
+            logger.info("Redis not configured (missing REDIS_URL); cache disabled")
+
+    def get(self, key: str) -> Optional[str]:
+        """Obtener un valor; None si no existe o si el cache no está disponible"""
+        if not self.enabled:
+            return None
+        try:
+            return self.client.get(key)
+        except Exception:
+            logger.warning("Redis GET failed for key=%s", key, exc_info=True)
+            return None
+
+    def set(self, key: str, value: str, ttl: int, index_key: Optional[str] = None) -> None:
+        """Guardar un valor con TTL.
+
+        Si se indica index_key, la key se registra en ese set para poder
+        invalidar todo el grupo en O(1) round-trips con delete_index().
+        """
+        if not self.enabled:
+            return
+        try:
+            pipe = self.client.pipeline()
+            pipe.setex(key, ttl, value)
+            if index_key:
+                pipe.sadd(index_key, key)
+                pipe.expire(index_key, ttl)
+            pipe.execute()
+        except Exception:
+            logger.warning("Redis SET failed for key=%s", key, exc_info=True)
+
+    def delete(self, *keys: str) -> None:
+        """Eliminar una o más keys"""
+        if not self.enabled or not keys:
+            return
+        try:
+            self.client.delete(*keys)
+        except Exception:
+            logger.warning("Redis DEL failed for keys=%s", keys, exc_info=True)
+
+    def delete_index(self, index_key: str) -> None:
+        """Eliminar todas las keys registradas en un set de índice (y el set)"""
+        if not self.enabled:
+            return
+        try:
+            keys = self.client.smembers(index_key)
+            self.client.delete(index_key, *keys)
+        except Exception:
+            logger.warning("Redis invalidation failed for index=%s", index_key, exc_info=True)
+
+
+# Instancia global del cache (no falla si no está configurado)
+redis_cache = RedisCache()
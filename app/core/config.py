@@ -33,6 +33,13 @@ class Settings(BaseSettings):
     # Value will be overridden below via _resolve_database_url() if env vars are present
     DATABASE_URL: str = _resolve_database_url()
     
+    # Pool de conexiones de SQLAlchemy (por proceso)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    # Entradas del cache de sentencias compiladas del engine
+    DB_QUERY_CACHE_SIZE: int = 1200
+    
     # JWT
     SECRET_KEY: str = "your-super-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
@@ -54,6 +61,13 @@ class Settings(BaseSettings):
     # Cloudflare R2 - Bucket público (blog, assets)
     R2_PUBLIC_BUCKET_NAME: str = ""
     R2_PUBLIC_BUCKET_URL: str = ""
+    # Conexiones HTTP del cliente S3 compartido (boto3 usa 10 por defecto; las
+    # subidas multipart usan hasta UPLOAD_MAX_CONCURRENCY por archivo, ver
+    # app/storage/r2.py)
+    R2_MAX_POOL_CONNECTIONS: int = 50
+    
+    # Redis (opcional): cache compartido entre workers. Vacío = cache deshabilitado
+    REDIS_URL: str = ""
     
     # CORS / Frontend origins (puede ser uno o varios separados por coma)
     FRONTEND_URL: str = "http://localhost:4321"
@@ -61,6 +75,9 @@ class Settings(BaseSettings):
     # Environment: development | staging | production
     ENV: str = "development"
     
+    # Migraciones al arrancar: skip (las corre el pre-deploy, scripts/migrate.py) | sync | async
+    MIGRATION_MODE: str = "skip"
+    
     class Config:
         env_file = ".env"
 
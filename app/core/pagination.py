@@ -0,0 +1,31 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+
+# Cursor de paginación por keyset "<microsegundos desde epoch de created_at>_<id>"
+# (seguro en URLs). Lo usan los listados ordenados por (created_at DESC, id DESC)
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def encode_cursor(row) -> Optional[str]:
+    """Cursor que apunta después de `row` (cualquier objeto con created_at e id);
+    None si created_at es NULL, porque no hay posición de keyset que codificar"""
+    created_at = row.created_at
+    if created_at is None:
+        return None
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+    return f"{(created_at - _EPOCH) // timedelta(microseconds=1)}_{row.id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """(created_at, id) de un cursor; 400 si está mal formado"""
+    try:
+        micros, row_id = cursor.split("_", 1)
+        return _EPOCH + timedelta(microseconds=int(micros)), int(row_id)
+    except (ValueError, OverflowError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
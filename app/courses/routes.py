@@ -1,7 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, aliased, raiseload
 from typing import List, Optional
+from itertools import groupby
+import asyncio
+import hashlib
+import time
 from pydantic import BaseModel
+import orjson
 
 from app.db.session import get_db
 from app.db.models import User, Course, Chapter, Lesson, CourseEnrollment, LessonProgress
@@ -15,7 +21,8 @@ from app.courses.schemas import (
     VideoUrlResponse, FileUploadResponse
 )
 from app.storage.r2 import r2_service
-from sqlalchemy import and_, func
+from app.core.http import etag_matches
+from sqlalchemy import and_, func, select
 
 router = APIRouter()
 
@@ -129,7 +136,7 @@ async def get_available_courses(
 ):
     """Obtener cursos disponibles públicamente con progreso si está autenticado"""
     # Obtener todos los cursos publicados
-    courses = db.query(Course).filter(Course.is_published == True).all()
+    courses = db.query(Course).options(raiseload('*')).filter(Course.is_published == True).all()
     
     response = []
     for course in courses:
@@ -173,7 +180,7 @@ async def get_available_courses(
                     progress_percentage = round((completed_lessons / total_lessons) * 100)
         
         # Cargar instructor
-        instructor = db.query(User).filter(User.id == course.instructor_id).first()
+        instructor = db.get(User, course.instructor_id)
         
         # Contar lecciones
         lesson_count = db.query(Lesson).filter(
@@ -222,46 +229,34 @@ async def get_my_courses(
 ):
     """Obtener cursos a los que el usuario logueado tiene acceso"""
     
-    # Obtener cursos del usuario usando el servicio
-    user_courses = course_service.get_user_courses(db, current_user.id)
-    
-    response = []
-    for course in user_courses:
-        # Verificar acceso
-        has_access = course_service.check_user_access(db, current_user.id, course.id)
-        
-        # Cargar instructor
-        instructor = db.query(User).filter(User.id == course.instructor_id).first()
-        
-        # Contar lecciones
-        lesson_count = db.query(Lesson).filter(
-            Lesson.course_id == course.id,
-            Lesson.is_published == True
-        ).count()
-        
-        # TODO: Calcular progreso real del usuario
-        progress_percentage = 0  # Implementar más adelante
-        
-        response.append(CourseListResponse(
-            id=course.id,
-            title=course.title,
-            short_description=course.short_description,
-            cover_image_url=get_safe_cover_url(course.cover_image_url),
-            trailer_video_url=get_safe_trailer_url(course.trailer_video_url),
-            level=course.level or "Beginner",
-            language=course.language or "Español",
-            category=course.category,
-            price=course.price,
-            is_premium=course.is_premium,
-            instructor_name=instructor.name if instructor else "Desconocido",
-            lesson_count=lesson_count,
-            estimated_duration_hours=course.estimated_duration_hours,
-            has_access=has_access,
+    # Listado liviano (columnas + instructor + conteo de lecciones), cacheado en el servicio.
+    # Todos los cursos del listado son accesibles para el usuario.
+    user_courses = course_service.get_user_courses_listing(db, current_user.id, current_user)
+    
+    # TODO: Calcular progreso real del usuario
+    progress_percentage = 0  # Implementar más adelante
+    
+    return [
+        CourseListResponse(
+            id=course["id"],
+            title=course["title"],
+            short_description=course["short_description"],
+            cover_image_url=get_safe_cover_url(course["cover_image_url"]),
+            trailer_video_url=get_safe_trailer_url(course["trailer_video_url"]),
+            level=course["level"] or "Beginner",
+            language=course["language"] or "Español",
+            category=course["category"],
+            price=course["price"],
+            is_premium=course["is_premium"],
+            instructor_name=course["instructor_name"] or "Desconocido",
+            lesson_count=course["lesson_count"],
+            estimated_duration_hours=course["estimated_duration_hours"],
+            has_access=True,
             progress_percentage=progress_percentage,
-            created_at=course.created_at
-        ))
-    
-    return response
+            created_at=course["created_at"]
+        )
+        for course in user_courses
+    ]
 
 @router.get("/my-courses-all", response_model=List[CourseListResponse])
 async def get_my_courses_all(
@@ -271,19 +266,19 @@ async def get_my_courses_all(
     """Obtener TODOS los cursos con indicación de acceso para la página Mis Cursos"""
     
     # Obtener TODOS los cursos activos
-    all_courses = db.query(Course).filter(Course.is_published == True).all()
+    all_courses = db.query(Course).options(raiseload('*')).filter(Course.is_published == True).all()
     
     response = []
     for course in all_courses:
         # Verificar acceso del usuario a este curso
-        has_access = course_service.check_user_access(db, current_user.id, course.id)
+        has_access = course_service.check_user_access(db, current_user.id, course.id, current_user)
         
         # Solo incluir cursos a los que tiene acceso O cursos premium bloqueados para mostrar estado
         include_course = has_access or course.is_premium
         
         if include_course:
             # Cargar instructor
-            instructor = db.query(User).filter(User.id == course.instructor_id).first()
+            instructor = db.get(User, course.instructor_id)
             
             # Contar lecciones
             lesson_count = db.query(Lesson).filter(
@@ -349,11 +344,8 @@ async def get_course_structure_public(
     
     result = []
     for chapter in chapters:
-        # Obtener lecciones publicadas del capítulo
-        lessons = db.query(Lesson).filter(
-            Lesson.chapter_id == chapter.id,
-            Lesson.is_published == True
-        ).order_by(Lesson.order_index).all()
+        # Lecciones publicadas del capítulo (ya cargadas y ordenadas por la relación)
+        lessons = [lesson for lesson in chapter.lessons if lesson.is_published]
         
         lesson_list = []
         for lesson in lessons:
@@ -412,7 +404,7 @@ async def get_course_structure_with_access(
         raise HTTPException(status_code=404, detail="Curso no encontrado")
     
     # Verificar acceso del usuario al curso
-    has_course_access = course_service.check_user_access(db, current_user.id, course_id)
+    has_course_access = course_service.check_user_access(db, current_user.id, course_id, current_user)
     
     # Obtener capítulos publicados con sus lecciones
     chapters = db.query(Chapter).filter(
@@ -422,16 +414,13 @@ async def get_course_structure_with_access(
     
     result = []
     for chapter in chapters:
-        # Obtener lecciones publicadas del capítulo
-        lessons = db.query(Lesson).filter(
-            Lesson.chapter_id == chapter.id,
-            Lesson.is_published == True
-        ).order_by(Lesson.order_index).all()
+        # Lecciones publicadas del capítulo (ya cargadas y ordenadas por la relación)
+        lessons = [lesson for lesson in chapter.lessons if lesson.is_published]
         
         lesson_list = []
         for lesson in lessons:
             # Verificar acceso a cada lección
-            has_lesson_access = lesson.is_free or has_course_access or current_user.role.name == 'admin'
+            has_lesson_access = lesson.is_free or has_course_access or course_service.is_admin(db, current_user)
             
             lesson_data = {
                 "id": lesson.id,
@@ -512,10 +501,10 @@ async def get_lesson_content(
     # Si está autenticado, verificar permisos
     else:
         # Verificar acceso al curso
-        has_access = course_service.check_user_access(db, current_user.id, lesson.course_id)
+        has_access = course_service.check_user_access(db, current_user.id, lesson.course_id, current_user)
         
         # Permitir acceso si es admin o tiene acceso al curso
-        if not (current_user.role.name == 'admin' or has_access):
+        if not (course_service.is_admin(db, current_user) or has_access):
             raise HTTPException(
                 status_code=403,
                 detail="No tienes acceso a esta lección. Contacta al administrador."
@@ -565,9 +554,9 @@ async def mark_lesson_complete(
         raise HTTPException(status_code=404, detail="Lección no encontrada")
     
     # Verificar acceso al curso
-    has_access = course_service.check_user_access(db, current_user.id, lesson.course_id)
+    has_access = course_service.check_user_access(db, current_user.id, lesson.course_id, current_user)
     
-    if not (current_user.role.name == 'admin' or lesson.is_free or has_access):
+    if not (course_service.is_admin(db, current_user) or lesson.is_free or has_access):
         raise HTTPException(
             status_code=403,
             detail="No tienes acceso a esta lección"
@@ -617,7 +606,7 @@ async def get_course_progress(
     from sqlalchemy import and_
     
     # Verificar acceso al curso
-    has_access = course_service.check_user_access(db, current_user.id, course_id)
+    has_access = course_service.check_user_access(db, current_user.id, course_id, current_user)
     
     if not has_access:
         raise HTTPException(
@@ -725,9 +714,9 @@ async def get_lesson_media_url(
         raise HTTPException(status_code=404, detail="Lección no encontrada")
     
     # Verificar acceso al curso
-    has_access = course_service.check_user_access(db, current_user.id, lesson.course_id)
+    has_access = course_service.check_user_access(db, current_user.id, lesson.course_id, current_user)
     
-    if not (current_user.role.name == 'admin' or lesson.is_free or has_access):
+    if not (course_service.is_admin(db, current_user) or lesson.is_free or has_access):
         raise HTTPException(
             status_code=403,
             detail="No tienes acceso a esta lección"
@@ -861,7 +850,7 @@ async def get_course_lessons(
             detail="Curso no encontrado"
         )
     
-    has_course_access = course_service.check_user_access(db, current_user.id, course.id)
+    has_course_access = course_service.check_user_access(db, current_user.id, course.id, current_user)
     
     lessons = db.query(Lesson).filter(
         Lesson.course_id == course_id,
@@ -894,8 +883,10 @@ async def get_lesson_video_url(
     """Obtener URL temporal para el video de una lección"""
     expiration = 3600  # 1 hora
     
-    video_url = course_service.get_secure_video_url(
-        db, current_user.id, lesson_id, expiration
+    # La verificación de acceso y la firma (boto3) son bloqueantes: ejecutarlas fuera del event loop
+    video_url = await asyncio.to_thread(
+        course_service.get_secure_video_url,
+        db, current_user.id, lesson_id, expiration, current_user
     )
     
     return VideoUrlResponse(
@@ -971,8 +962,8 @@ async def grant_course_access(
     )
     
     # Cargar información del usuario y curso para la respuesta
-    user = db.query(User).filter(User.id == request.user_id).first()
-    course = db.query(Course).filter(Course.id == request.course_id).first()
+    user = db.get(User, request.user_id)
+    course = db.get(Course, request.course_id)
     
     return {
         "message": f"✅ Acceso otorgado al curso '{course.title}' para {user.name}",
@@ -1004,35 +995,54 @@ async def revoke_course_access_endpoint(
         )
     
     # Cargar información del usuario y curso para la respuesta
-    user = db.query(User).filter(User.id == request.user_id).first()
-    course = db.query(Course).filter(Course.id == request.course_id).first()
+    user = db.get(User, request.user_id)
+    course = db.get(Course, request.course_id)
     
     return {
         "message": f"❌ Acceso revocado al curso '{course.title}' para {user.name}"
     }
 
+def _iter_enrollments_json(db: Session):
+    """Serializar los enrollments como un array JSON en lotes, sin cargar toda la tabla en memoria.
+
+    Usa la sesión de la request (la misma con la que require_admin cargó al usuario):
+    desde FastAPI 0.118 las dependencias con yield se cierran después de enviar la
+    respuesta, así que sigue abierta mientras se consume el generador.
+    """
+    granted_by_user = aliased(User)
+    rows = (
+        db.query(
+            CourseEnrollment.id,
+            User.name.label("user_name"),
+            User.email.label("user_email"),
+            Course.title.label("course_title"),
+            CourseEnrollment.has_access,
+            CourseEnrollment.enrollment_date,
+            CourseEnrollment.access_granted_date,
+            granted_by_user.name.label("granted_by"),
+        )
+        .join(User, User.id == CourseEnrollment.user_id)
+        .outerjoin(Course, Course.id == CourseEnrollment.course_id)
+        .outerjoin(granted_by_user, granted_by_user.id == CourseEnrollment.access_granted_by)
+        .order_by(CourseEnrollment.id)
+        .yield_per(500)
+    )
+
+    yield b"["
+    for index, row in enumerate(rows):
+        if index:
+            yield b","
+        yield orjson.dumps(row._asdict())
+    yield b"]"
+
 @router.get("/admin/enrollments")
 async def get_all_enrollments(
     current_user: User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
     """Obtener todos los enrollments para administración"""
-    enrollments = db.query(CourseEnrollment).all()
-    
-    response = []
-    for enrollment in enrollments:
-        response.append({
-            "id": enrollment.id,
-            "user_name": enrollment.user.name,
-            "user_email": enrollment.user.email,
-            "course_title": enrollment.course.title,
-            "has_access": enrollment.has_access,
-            "enrollment_date": enrollment.enrollment_date,
-            "access_granted_date": enrollment.access_granted_date,
-            "granted_by": enrollment.granted_by.name if enrollment.granted_by else None
-        })
-    
-    return response
+    # Generador síncrono: Starlette lo itera en el threadpool, sin bloquear el event loop
+    return StreamingResponse(_iter_enrollments_json(db), media_type="application/json")
 
 @router.get("/admin/user/{user_id}/courses")
 async def get_user_courses_with_access_status(
@@ -1043,20 +1053,31 @@ async def get_user_courses_with_access_status(
     """Obtener todos los cursos con el estado de acceso de un usuario específico"""
     
     # Verificar que el usuario existe
-    target_user = db.query(User).filter(User.id == user_id).first()
+    target_user = db.get(User, user_id)
     if not target_user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
     # Obtener todos los cursos premium
-    courses = db.query(Course).filter(Course.is_premium == True).all()
-    
+    courses = db.query(Course).options(raiseload('*')).filter(Course.is_premium == True).all()
+
+    # Admin o premium global ven todo; si no, cargar los enrollments con acceso en una sola consulta
+    has_global_access = course_service.is_admin(db, target_user) or target_user.has_premium_access
+    granted_course_ids = set()
+    if not has_global_access:
+        granted_course_ids = {
+            row[0] for row in db.query(CourseEnrollment.course_id).filter(
+                CourseEnrollment.user_id == user_id,
+                CourseEnrollment.has_access == True
+            ).all()
+        }
+
     response = []
     for course in courses:
         # Verificar si el usuario tiene acceso a este curso específico
-        has_individual_access = course_service.check_user_access(db, user_id, course.id)
+        has_individual_access = has_global_access or course.id in granted_course_ids
         
         # Cargar instructor
-        instructor = db.query(User).filter(User.id == course.instructor_id).first()
+        instructor = db.get(User, course.instructor_id)
         
         response.append({
             "id": course.id,
@@ -1084,7 +1105,7 @@ async def create_course_admin(
     course = course_service.create_course(db, course_data)
     
     # Cargar datos relacionados para la respuesta
-    instructor = db.query(User).filter(User.id == course.instructor_id).first()
+    instructor = db.get(User, course.instructor_id)
     return CourseResponse(
         **course.__dict__,
         instructor_name=instructor.name,
@@ -1125,23 +1146,46 @@ async def update_course_admin(
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+# Sentencia definida una sola vez: SQLAlchemy reutiliza su SQL compilado en cada request
+COURSES_WITH_INSTRUCTOR = select(Course, User.name).outerjoin(User, User.id == Course.instructor_id)
+
+# Las portadas del bucket privado se firman por 1 hora: el ETag rota cada 30 minutos
+# para que un 304 nunca haga reutilizar una URL firmada ya vencida
+COURSES_ETAG_WINDOW_SECONDS = 1800
+
+def _courses_list_etag(db: Session) -> str:
+    """ETag débil del listado de cursos a partir de conteos y fechas de modificación"""
+    course_stats = db.query(
+        func.count(Course.id), func.max(Course.created_at), func.max(Course.updated_at)
+    ).one()
+    lesson_stats = db.query(
+        func.count(Lesson.id), func.max(Lesson.created_at), func.max(Lesson.updated_at)
+    ).one()
+    window = int(time.time() // COURSES_ETAG_WINDOW_SECONDS)
+    digest = hashlib.md5(f"{tuple(course_stats)}|{tuple(lesson_stats)}|{window}".encode()).hexdigest()
+    return f'W/"{digest}"'
+
 @router.get("/admin/courses/", response_model=List[CourseListResponse])
 async def get_admin_courses_list(
+    request: Request,
+    response: Response,
     current_user: User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
     """Obtener todos los cursos para administración"""
-    courses = db.query(Course).all()
+    etag = _courses_list_etag(db)
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    response.headers["ETag"] = etag
+
+    rows = db.execute(COURSES_WITH_INSTRUCTOR).all()
     
-    response = []
-    for course in courses:
-        # Cargar instructor
-        instructor = db.query(User).filter(User.id == course.instructor_id).first()
-        
+    result = []
+    for course, instructor_name in rows:
         # Contar lecciones
         lesson_count = db.query(Lesson).filter(Lesson.course_id == course.id).count()
         
-        response.append(CourseListResponse(
+        result.append(CourseListResponse(
             id=course.id,
             title=course.title,
             description=course.description,
@@ -1154,13 +1198,13 @@ async def get_admin_courses_list(
             price=course.price,
             is_premium=course.is_premium,
             is_published=course.is_published,
-            instructor_name=instructor.name if instructor else "Desconocido",
+            instructor_name=instructor_name or "Desconocido",
             lesson_count=lesson_count,
             estimated_duration_hours=course.estimated_duration_hours,
             created_at=course.created_at
         ))
     
-    return response
+    return result
 
 @router.delete("/admin/courses/{course_id}")
 async def delete_course_admin(
@@ -1189,19 +1233,20 @@ async def get_course_structure_admin(
     db: Session = Depends(get_db)
 ):
     """Obtener estructura completa del curso (capítulos y lecciones) para administradores"""
-    course = db.query(Course).filter(Course.id == course_id).first()
+    course = db.get(Course, course_id)
     if not course:
         raise HTTPException(status_code=404, detail="Course not found")
     
-    chapters = db.query(Chapter).filter(
+    # Capítulos y lecciones en una sola consulta (LEFT JOIN), agrupados luego por capítulo
+    rows = db.query(Chapter, Lesson).outerjoin(
+        Lesson, Lesson.chapter_id == Chapter.id
+    ).filter(
         Chapter.course_id == course_id
-    ).order_by(Chapter.order_index).all()
+    ).order_by(Chapter.order_index, Chapter.id, Lesson.order_index).all()
     
     result = []
-    for chapter in chapters:
-        lessons = db.query(Lesson).filter(
-            Lesson.chapter_id == chapter.id
-        ).order_by(Lesson.order_index).all()
+    for chapter, chapter_rows in groupby(rows, key=lambda row: row[0]):
+        lessons = [lesson for _, lesson in chapter_rows if lesson is not None]
         
         chapter_data = {
             "id": chapter.id,
@@ -1270,9 +1315,7 @@ async def update_chapter_admin(
         if not chapter:
             raise HTTPException(status_code=404, detail="Chapter not found")
 
-        lessons = db.query(Lesson).filter(
-            Lesson.chapter_id == chapter.id
-        ).order_by(Lesson.order_index).all()
+        lessons = chapter.lessons
 
         return {
             "id": chapter.id,
@@ -1376,12 +1419,13 @@ async def reorder_lessons_admin(
 @router.delete("/admin/lessons/{lesson_id}")
 async def delete_lesson_admin(
     lesson_id: int,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
-    """Eliminar lección (y su archivo en R2 si existe)"""
+    """Eliminar lección (y su archivo en R2 si existe, después de responder)"""
     try:
-        ok = course_service.delete_lesson(db, lesson_id)
+        ok = course_service.delete_lesson(db, lesson_id, background_tasks)
         if not ok:
             raise HTTPException(status_code=404, detail="Lesson not found")
         return {"message": "Lesson deleted"}
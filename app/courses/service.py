@@ -1,7 +1,11 @@
-from typing import Optional, List
-from sqlalchemy.orm import Session, joinedload
-from fastapi import HTTPException, status
+from typing import Optional, List, Tuple
+from sqlalchemy.orm import Session, joinedload, selectinload, raiseload
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy import select, update, delete, func, or_, text, values, column, Integer
+from fastapi import BackgroundTasks, HTTPException, status
 from datetime import datetime
+import orjson
+from urllib.parse import urlparse
 
 from app.db.models import User, Course, Chapter, Lesson, CourseEnrollment, LessonProgress
 from app.courses.schemas import (
@@ -9,10 +13,85 @@ from app.courses.schemas import (
     LessonCreate, LessonUpdate, LessonProgressUpdate
 )
 from app.storage.r2 import r2_service
+from app.core.config import settings
+from app.core.cache import redis_cache
+from app.db.init_db import get_role_id
+
+# Tiempo máximo que un permiso cacheado puede quedar desactualizado ante cambios
+# que no lo invalidan explícitamente (p.ej. cambiar is_premium de un curso)
+ACCESS_CACHE_TTL_SECONDS = 300
+
+# El listado "Mis cursos" también refleja ediciones de cursos, que no lo invalidan
+LISTING_CACHE_TTL_SECONDS = 60
+
+# course_id / is_free de una lección casi no cambian y se invalidan explícitamente;
+# el TTL solo acota el caso de borrados que no pasan por el servicio
+LESSON_META_CACHE_TTL_SECONDS = 86400
+
+def _access_cache_key(user_id: int, course_id: int) -> str:
+    return f"access:{user_id}:{course_id}"
+
+def _access_index_key(user_id: int) -> str:
+    return f"access:{user_id}:keys"
+
+def _listing_cache_key(user_id: int) -> str:
+    return f"listing:user:{user_id}"
+
+def _lesson_meta_key(lesson_id: int) -> str:
+    return f"lesson:meta:{lesson_id}"
+
+def _object_key_from_url(url: Optional[str]) -> str:
+    """Obtener la key de R2 de una URL pública (o devolver la key tal cual)"""
+    if not url:
+        return ''
+    path = urlparse(url).path.lstrip('/') if (url.startswith('http://') or url.startswith('https://')) else url
+    # Quitar prefijo de bucket si está presente
+    bucket_prefix = f"{settings.R2_BUCKET_NAME}/"
+    if path.startswith(bucket_prefix):
+        path = path[len(bucket_prefix):]
+    # Fallback: mantener desde 'courses/...'
+    idx = path.rfind('/courses/')
+    if idx != -1:
+        path = path[idx+1:]
+    return path
+
+def _order_values(ids: List[int]):
+    """Tabla VALUES (id, pos) con la nueva posición (1..N) de cada id, con parámetros enlazados"""
+    return values(
+        column("id", Integer), column("pos", Integer), name="new_order"
+    ).data([(item_id, position) for position, item_id in enumerate(ids, start=1)])
 
 class CourseService:
     @staticmethod
-    def check_user_access(db: Session, user_id: int, course_id: int) -> bool:
+    def is_admin(db: Session, user: User) -> bool:
+        """Verificar si el usuario es admin comparando role_id (sin cargar la relación role)"""
+        admin_role_id = get_role_id(db, "admin")
+        return admin_role_id is not None and user.role_id == admin_role_id
+    
+    @staticmethod
+    def check_user_access(db: Session, user_id: int, course_id: int, user: Optional[User] = None) -> bool:
+        """Verificar si un usuario tiene acceso a un curso (cacheado en Redis si está configurado)
+        
+        Si el caller ya tiene el usuario cargado (p.ej. current_user) puede pasarlo
+        en `user` para evitar volver a consultarlo.
+        """
+        key = _access_cache_key(user_id, course_id)
+        cached = redis_cache.get(key)
+        if cached is not None:
+            return cached == "1"
+        
+        has_access = CourseService._compute_user_access(db, user_id, course_id, user)
+        redis_cache.set(key, "1" if has_access else "0", ACCESS_CACHE_TTL_SECONDS, index_key=_access_index_key(user_id))
+        return has_access
+    
+    @staticmethod
+    def invalidate_user_access(user_id: int) -> None:
+        """Descartar los permisos y el listado de cursos cacheados de un usuario (tras otorgar/revocar acceso)"""
+        redis_cache.delete_index(_access_index_key(user_id))
+        redis_cache.delete(_listing_cache_key(user_id))
+    
+    @staticmethod
+    def _compute_user_access(db: Session, user_id: int, course_id: int, user: Optional[User] = None) -> bool:
         """Verificar si un usuario tiene acceso a un curso
         
         Niveles de acceso:
@@ -21,23 +100,26 @@ class CourseService:
         3. Premium global → Ve todos los cursos premium
         4. Enrollment específico → Solo cursos comprados individualmente
         """
-        user = db.query(User).filter(User.id == user_id).first()
+        # Usuario (salvo que ya venga cargado); el rol se resuelve por role_id
+        if user is None:
+            user = db.get(User, user_id)
         if not user:
             return False
         
         # 1. Los admins tienen acceso a todo
-        if user.role.name == "admin":
-            return True
-        
-        # 2. Para cursos gratuitos, todos pueden acceder
-        course = db.query(Course).filter(Course.id == course_id).first()
-        if course and not course.is_premium:
+        if CourseService.is_admin(db, user):
             return True
         
         # 3. ACCESO PREMIUM GLOBAL: Si el usuario tiene acceso premium global, puede ver todo
+        # (se evalúa antes que el curso porque no requiere otra consulta)
         if user.has_premium_access:
             return True
         
+        # 2. Para cursos gratuitos, todos pueden acceder
+        course = db.get(Course, course_id)
+        if course and not course.is_premium:
+            return True
+        
         # 4. ACCESO POR CURSO: Verificar si tiene enrollment específico para este curso
         enrollment = db.query(CourseEnrollment).filter(
             CourseEnrollment.user_id == user_id,
@@ -48,37 +130,57 @@ class CourseService:
         return enrollment is not None
     
     @staticmethod
-    def check_lesson_access(db: Session, user_id: int, lesson_id: int) -> bool:
+    def get_lesson_meta(db: Session, lesson_id: int) -> Optional[dict]:
+        """Obtener {"course_id", "is_free"} de una lección (cacheado en Redis si está configurado)"""
+        key = _lesson_meta_key(lesson_id)
+        cached = redis_cache.get(key)
+        if cached is not None:
+            return orjson.loads(cached)
+        
+        row = db.execute(
+            select(Lesson.course_id, Lesson.is_free).where(Lesson.id == lesson_id)
+        ).first()
+        if row is None:
+            return None
+        
+        meta = {"course_id": row.course_id, "is_free": bool(row.is_free)}
+        redis_cache.set(key, orjson.dumps(meta).decode(), LESSON_META_CACHE_TTL_SECONDS)
+        return meta
+    
+    @staticmethod
+    def invalidate_lesson_meta(*lesson_ids: int) -> None:
+        """Descartar la metadata cacheada de una o más lecciones (tras editarlas o eliminarlas)"""
+        redis_cache.delete(*[_lesson_meta_key(lesson_id) for lesson_id in lesson_ids])
+    
+    @staticmethod
+    def check_lesson_access(db: Session, user_id: int, lesson_id: int, user: Optional[User] = None) -> bool:
         """Verificar si un usuario tiene acceso a una lección específica"""
-        lesson = db.query(Lesson).filter(Lesson.id == lesson_id).first()
-        if not lesson:
+        meta = CourseService.get_lesson_meta(db, lesson_id)
+        if not meta:
             return False
         
         # Si la lección es gratuita, todos pueden acceder
-        if lesson.is_free:
+        if meta["is_free"]:
             return True
         
         # Verificar acceso al curso
-        return CourseService.check_user_access(db, user_id, lesson.course_id)
+        return CourseService.check_user_access(db, user_id, meta["course_id"], user)
     
     @staticmethod
-    def grant_lifetime_access(
-        db: Session, 
-        user_id: int, 
-        granted_by_user_id: int,
-        notes: str = "Pago verificado - Acceso premium global"
-    ) -> User:
-        """Otorgar acceso premium GLOBAL de por vida a un usuario (puede ver TODOS los cursos)"""
-        # Verificar que el usuario que otorga sea admin
-        granted_by = db.query(User).filter(User.id == granted_by_user_id).first()
-        if not granted_by or granted_by.role.name != "admin":
+    def _require_admin_granter(db: Session, granted_by_user_id: int) -> User:
+        """Verificar que el usuario que otorga sea admin"""
+        granted_by = db.get(User, granted_by_user_id)
+        if not granted_by or not CourseService.is_admin(db, granted_by):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="Solo los administradores pueden otorgar acceso"
             )
-        
-        # Otorgar acceso premium global
-        user = db.query(User).filter(User.id == user_id).first()
+        return granted_by
+    
+    @staticmethod
+    def _grant_lifetime_access_no_commit(db: Session, user_id: int, granted_by_user_id: int) -> User:
+        """Marcar acceso premium global sin confirmar la transacción"""
+        user = db.get(User, user_id)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -97,30 +199,55 @@ class CourseService:
             access_granted_by=granted_by_user_id
         )
         db.add(enrollment)
+        return user
+    
+    @staticmethod
+    def grant_lifetime_access(
+        db: Session, 
+        user_id: int, 
+        granted_by_user_id: int,
+        notes: str = "Pago verificado - Acceso premium global"
+    ) -> User:
+        """Otorgar acceso premium GLOBAL de por vida a un usuario (puede ver TODOS los cursos)"""
+        CourseService._require_admin_granter(db, granted_by_user_id)
+        
+        # Otorgar acceso premium global
+        user = CourseService._grant_lifetime_access_no_commit(db, user_id, granted_by_user_id)
         
         db.commit()
+        CourseService.invalidate_user_access(user_id)
         db.refresh(user)
         return user
     
     @staticmethod
-    def grant_course_access(
+    def grant_lifetime_access_bulk(db: Session, user_ids: List[int], granted_by_user_id: int) -> List[User]:
+        """Otorgar acceso premium global a varios usuarios en una sola transacción"""
+        CourseService._require_admin_granter(db, granted_by_user_id)
+        
+        try:
+            users = [
+                CourseService._grant_lifetime_access_no_commit(db, user_id, granted_by_user_id)
+                for user_id in user_ids
+            ]
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        
+        for user_id in set(user_ids):
+            CourseService.invalidate_user_access(user_id)
+        return users
+    
+    @staticmethod
+    def _grant_course_access_no_commit(
         db: Session,
         user_id: int,
         course_id: int,
-        granted_by_user_id: int,
-        notes: str = "Acceso individual al curso"
+        granted_by_user_id: int
     ) -> CourseEnrollment:
-        """Otorgar acceso a UN CURSO ESPECÍFICO"""
-        # Verificar que el usuario que otorga sea admin
-        granted_by = db.query(User).filter(User.id == granted_by_user_id).first()
-        if not granted_by or granted_by.role.name != "admin":
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Solo los administradores pueden otorgar acceso"
-            )
-        
+        """Crear o reactivar el enrollment de un curso sin confirmar la transacción"""
         # Verificar que el curso existe
-        course = db.query(Course).filter(Course.id == course_id).first()
+        course = db.get(Course, course_id)
         if not course:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -128,44 +255,76 @@ class CourseService:
             )
         
         # Verificar que el usuario existe
-        user = db.query(User).filter(User.id == user_id).first()
+        user = db.get(User, user_id)
         if not user:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="Usuario no encontrado"
             )
         
-        # Verificar si ya tiene enrollment para este curso
-        existing_enrollment = db.query(CourseEnrollment).filter(
-            CourseEnrollment.user_id == user_id,
-            CourseEnrollment.course_id == course_id
-        ).first()
+        # Crear el enrollment o reactivar el existente en una sola sentencia
+        # (INSERT ... ON CONFLICT DO UPDATE ... RETURNING)
+        now = datetime.utcnow()
+        stmt = pg_insert(CourseEnrollment).values(
+            user_id=user_id,
+            course_id=course_id,
+            has_access=True,
+            access_granted_date=now,
+            access_granted_by=granted_by_user_id
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CourseEnrollment.user_id, CourseEnrollment.course_id],
+            index_where=text("course_id <> 0"),
+            set_={
+                "has_access": True,
+                "access_granted_date": now,
+                "access_granted_by": granted_by_user_id
+            }
+        ).returning(CourseEnrollment)
+        return db.execute(stmt, execution_options={"populate_existing": True}).scalar_one()
+    
+    @staticmethod
+    def grant_course_access(
+        db: Session,
+        user_id: int,
+        course_id: int,
+        granted_by_user_id: int,
+        notes: str = "Acceso individual al curso"
+    ) -> CourseEnrollment:
+        """Otorgar acceso a UN CURSO ESPECÍFICO"""
+        CourseService._require_admin_granter(db, granted_by_user_id)
         
-        if existing_enrollment:
-            # Actualizar enrollment existente
-            existing_enrollment.has_access = True
-            existing_enrollment.access_granted_date = datetime.utcnow()
-            existing_enrollment.access_granted_by = granted_by_user_id
-            db.commit()
-            db.refresh(existing_enrollment)
-            return existing_enrollment
-        else:
-            # Crear nuevo enrollment
-            enrollment = CourseEnrollment(
-                user_id=user_id,
-                course_id=course_id,
-                has_access=True,
-                access_granted_date=datetime.utcnow(),
-                access_granted_by=granted_by_user_id
-            )
-            db.add(enrollment)
+        enrollment = CourseService._grant_course_access_no_commit(db, user_id, course_id, granted_by_user_id)
+        db.commit()
+        CourseService.invalidate_user_access(user_id)
+        return enrollment
+    
+    @staticmethod
+    def grant_course_access_bulk(
+        db: Session,
+        grants: List[Tuple[int, int]],
+        granted_by_user_id: int
+    ) -> List[CourseEnrollment]:
+        """Otorgar acceso a varios pares (user_id, course_id) en una sola transacción"""
+        CourseService._require_admin_granter(db, granted_by_user_id)
+        
+        try:
+            enrollments = [
+                CourseService._grant_course_access_no_commit(db, user_id, course_id, granted_by_user_id)
+                for user_id, course_id in grants
+            ]
             db.commit()
-            db.refresh(enrollment)
-            return enrollment
+        except Exception:
+            db.rollback()
+            raise
+        
+        for user_id in {user_id for user_id, _ in grants}:
+            CourseService.invalidate_user_access(user_id)
+        return enrollments
     
     @staticmethod
-    def revoke_course_access(db: Session, user_id: int, course_id: int) -> bool:
-        """Revocar acceso a un curso"""
+    def _revoke_course_access_no_commit(db: Session, user_id: int, course_id: int) -> bool:
+        """Quitar el acceso de un enrollment sin confirmar la transacción"""
         enrollment = db.query(CourseEnrollment).filter(
             CourseEnrollment.user_id == user_id,
             CourseEnrollment.course_id == course_id
@@ -173,28 +332,61 @@ class CourseService:
         
         if enrollment:
             enrollment.has_access = False
+            return True
+        
+        return False
+    
+    @staticmethod
+    def revoke_course_access(db: Session, user_id: int, course_id: int) -> bool:
+        """Revocar acceso a un curso"""
+        if CourseService._revoke_course_access_no_commit(db, user_id, course_id):
             db.commit()
+            CourseService.invalidate_user_access(user_id)
             return True
         
         return False
     
+    @staticmethod
+    def revoke_course_access_bulk(db: Session, revocations: List[Tuple[int, int]]) -> int:
+        """Revocar acceso a varios pares (user_id, course_id) en una sola transacción
+        
+        Devuelve la cantidad de enrollments revocados.
+        """
+        revoked = 0
+        revoked_users = set()
+        try:
+            for user_id, course_id in revocations:
+                if CourseService._revoke_course_access_no_commit(db, user_id, course_id):
+                    revoked += 1
+                    revoked_users.add(user_id)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        
+        for user_id in revoked_users:
+            CourseService.invalidate_user_access(user_id)
+        return revoked
+    
     @staticmethod
     def grant_premium_access(db: Session, user_id: int) -> bool:
         """Otorgar acceso premium general a un usuario"""
-        user = db.query(User).filter(User.id == user_id).first()
+        user = db.get(User, user_id)
         if user:
             user.has_premium_access = True
             db.commit()
+            CourseService.invalidate_user_access(user_id)
             return True
         return False
     
     @staticmethod
     def revoke_premium_access(db: Session, user_id: int) -> bool:
         """Revocar acceso premium general de un usuario"""
-        user = db.query(User).filter(User.id == user_id).first()
+        user = db.get(User, user_id)
         if user:
             user.has_premium_access = False
             db.commit()
+            CourseService.invalidate_user_access(user_id)
             return True
         return False
     
@@ -203,18 +395,19 @@ class CourseService:
         db: Session, 
         user_id: int, 
         lesson_id: int,
-        expiration: int = 3600  # 1 hora por defecto
+        expiration: int = 3600,  # 1 hora por defecto
+        user: Optional[User] = None
     ) -> Optional[str]:
         """Obtener URL firmada temporal para un video"""
         # Verificar acceso
-        if not CourseService.check_lesson_access(db, user_id, lesson_id):
+        if not CourseService.check_lesson_access(db, user_id, lesson_id, user):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="No tienes acceso a esta lección"
             )
         
         # Obtener la lección
-        lesson = db.query(Lesson).filter(Lesson.id == lesson_id).first()
+        lesson = db.get(Lesson, lesson_id)
         if not lesson or not lesson.video_object_key:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
@@ -223,15 +416,7 @@ class CourseService:
         
         # Generar URL firmada temporal
         try:
-            url = r2_service.client.generate_presigned_url(
-                'get_object',
-                Params={
-                    'Bucket': r2_service.bucket_name,
-                    'Key': lesson.video_object_key
-                },
-                ExpiresIn=expiration
-            )
-            return url
+            return r2_service.generate_presigned_get_url(lesson.video_object_key, expiration=expiration)
         except Exception as e:
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -239,42 +424,88 @@ class CourseService:
             )
     
     @staticmethod
-    def get_user_courses(db: Session, user_id: int) -> List[Course]:
-        """Obtener cursos a los que el usuario tiene acceso"""
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            return []
+    def _accessible_courses_criteria(db: Session, user: User) -> list:
+        """Filtros de los cursos publicados a los que el usuario tiene acceso"""
+        criteria = [Course.is_published == True]
         
         # Si es admin, obtener todos los cursos
-        if user.role.name == "admin":
-            return db.query(Course).filter(Course.is_published == True).all()
+        if CourseService.is_admin(db, user):
+            return criteria
         
         # Si tiene acceso premium, obtener todos los cursos premium
         if user.has_premium_access:
-            return db.query(Course).filter(
-                Course.is_published == True,
-                Course.is_premium == True
-            ).all()
+            return criteria + [Course.is_premium == True]
         
-        # Obtener cursos específicos con enrollment
-        enrollments = db.query(CourseEnrollment).filter(
-            CourseEnrollment.user_id == user_id,
+        # Cursos gratuitos + cursos específicos con enrollment, en una sola consulta
+        enrolled_course_ids = select(CourseEnrollment.course_id).where(
+            CourseEnrollment.user_id == user.id,
             CourseEnrollment.has_access == True
-        ).all()
+        )
+        return criteria + [
+            or_(
+                Course.is_premium == False,
+                Course.id.in_(enrolled_course_ids)
+            )
+        ]
+    
+    @staticmethod
+    def get_user_courses(db: Session, user_id: int) -> List[Course]:
+        """Obtener cursos a los que el usuario tiene acceso"""
+        user = db.get(User, user_id)
+        if not user:
+            return []
         
-        course_ids = [e.course_id for e in enrollments]
-        courses = db.query(Course).filter(
-            Course.id.in_(course_ids),
-            Course.is_published == True
+        return db.query(Course).options(raiseload('*')).filter(
+            *CourseService._accessible_courses_criteria(db, user)
         ).all()
+    
+    @staticmethod
+    def get_user_courses_listing(db: Session, user_id: int, user: Optional[User] = None) -> List[dict]:
+        """Listado liviano (dicts) de los cursos a los que el usuario tiene acceso
+        
+        Consulta solo las columnas del listado, con el nombre del instructor y la
+        cantidad de lecciones publicadas, sin construir objetos ORM. El resultado
+        se cachea en Redis (si está configurado) y se invalida junto con los permisos.
+        """
+        key = _listing_cache_key(user_id)
+        cached = redis_cache.get(key)
+        if cached is not None:
+            return orjson.loads(cached)
+        
+        if user is None:
+            user = db.get(User, user_id)
+        if not user:
+            return []
         
-        # Agregar cursos gratuitos
-        free_courses = db.query(Course).filter(
-            Course.is_published == True,
-            Course.is_premium == False
+        lesson_count = select(func.count(Lesson.id)).where(
+            Lesson.course_id == Course.id,
+            Lesson.is_published == True
+        ).correlate(Course).scalar_subquery()
+        
+        rows = db.query(
+            Course.id,
+            Course.title,
+            Course.short_description,
+            Course.cover_image_url,
+            Course.trailer_video_url,
+            Course.level,
+            Course.language,
+            Course.category,
+            Course.price,
+            Course.is_premium,
+            Course.estimated_duration_hours,
+            Course.created_at,
+            User.name.label("instructor_name"),
+            lesson_count.label("lesson_count")
+        ).outerjoin(
+            User, User.id == Course.instructor_id
+        ).filter(
+            *CourseService._accessible_courses_criteria(db, user)
         ).all()
         
-        return courses + free_courses
+        listing = [row._asdict() for row in rows]
+        redis_cache.set(key, orjson.dumps(listing).decode(), LISTING_CACHE_TTL_SECONDS)
+        return listing
 
     # ===== NUEVOS MÉTODOS PARA GESTIÓN COMPLETA DE CURSOS =====
     
@@ -290,7 +521,7 @@ class CourseService:
     @staticmethod
     def update_course(db: Session, course_id: int, course_data: CourseUpdate) -> Optional[Course]:
         """Actualizar un curso existente"""
-        course = db.query(Course).filter(Course.id == course_id).first()
+        course = db.get(Course, course_id)
         if not course:
             return None
         
@@ -303,11 +534,18 @@ class CourseService:
         return course
 
     @staticmethod
-    def get_course_with_structure(db: Session, course_id: int, user_id: Optional[int] = None) -> Optional[Course]:
+    def get_course_with_structure(
+        db: Session,
+        course_id: int,
+        user_id: Optional[int] = None,
+        user: Optional[User] = None
+    ) -> Optional[Course]:
         """Obtener curso completo con capítulos y lecciones"""
+        # Todo lo que no se carga explícitamente falla en lugar de disparar lazy loads (N+1)
         course = db.query(Course).options(
-            joinedload(Course.chapters).joinedload(Chapter.lessons),
-            joinedload(Course.instructor)
+            selectinload(Course.chapters).selectinload(Chapter.lessons).raiseload('*'),
+            joinedload(Course.instructor),
+            raiseload('*')
         ).filter(Course.id == course_id).first()
         
         if not course:
@@ -316,7 +554,7 @@ class CourseService:
         # Si hay un usuario, agregar información de progreso
         if user_id:
             # Verificar acceso
-            has_access = CourseService.check_user_access(db, user_id, course_id)
+            has_access = CourseService.check_user_access(db, user_id, course_id, user)
             course.has_access = has_access
             
             # Obtener progreso si tiene acceso
@@ -343,7 +581,7 @@ class CourseService:
     @staticmethod
     def update_chapter(db: Session, chapter_id: int, chapter_data: ChapterUpdate) -> Optional[Chapter]:
         """Actualizar un capítulo"""
-        chapter = db.query(Chapter).filter(Chapter.id == chapter_id).first()
+        chapter = db.get(Chapter, chapter_id)
         if not chapter:
             return None
         
@@ -367,7 +605,7 @@ class CourseService:
     @staticmethod
     def update_lesson(db: Session, lesson_id: int, lesson_data: LessonUpdate) -> Optional[Lesson]:
         """Actualizar una lección"""
-        lesson = db.query(Lesson).filter(Lesson.id == lesson_id).first()
+        lesson = db.get(Lesson, lesson_id)
         if not lesson:
             return None
         
@@ -382,6 +620,7 @@ class CourseService:
         
         lesson.updated_at = datetime.utcnow()
         db.commit()
+        CourseService.invalidate_lesson_meta(lesson_id)
         db.refresh(lesson)
         return lesson
 
@@ -390,81 +629,118 @@ class CourseService:
         db: Session, 
         user_id: int, 
         lesson_id: int, 
-        progress_data: LessonProgressUpdate
+        progress_data: LessonProgressUpdate,
+        user: Optional[User] = None
     ) -> LessonProgress:
-        """Actualizar el progreso de una lección"""
+        """Actualizar el progreso de una lección
+        
+        Se llama en cada heartbeat del reproductor, así que no materializa la fila:
+        UPDATE ... RETURNING y, si no existía, INSERT ... RETURNING. El progreso
+        del curso (conteo de lecciones completadas) solo se recalcula cuando la
+        lección cambia de estado, en la misma transacción (un solo commit).
+        """
         # Verificar que el usuario tenga acceso a la lección
-        lesson = db.query(Lesson).filter(Lesson.id == lesson_id).first()
-        if not lesson:
+        meta = CourseService.get_lesson_meta(db, lesson_id)
+        if meta is None:
             raise HTTPException(status_code=404, detail="Lesson not found")
+        course_id = meta["course_id"]
         
-        if not CourseService.check_user_access(db, user_id, lesson.course_id):
+        if not CourseService.check_user_access(db, user_id, course_id, user):
             raise HTTPException(status_code=403, detail="Access denied to this lesson")
         
-        # Buscar progreso existente o crear uno nuevo
-        progress = db.query(LessonProgress).filter(
+        now = datetime.utcnow()
+        progress_values = progress_data.dict()
+        progress_values["updated_at"] = now
+        
+        # Marcar como completado si el progreso es 100%
+        if progress_data.progress_percentage >= 100 and not progress_data.is_completed:
+            progress_values["is_completed"] = True
+            progress_values["completed_at"] = now
+        
+        # Actualizar progreso existente o crear uno nuevo. El FROM sobre la misma
+        # fila devuelve el estado previo para detectar cambios de completitud.
+        previous = select(
+            LessonProgress.id,
+            LessonProgress.is_completed.label("was_completed")
+        ).where(
             LessonProgress.user_id == user_id,
             LessonProgress.lesson_id == lesson_id
+        ).subquery()
+        
+        row = db.execute(
+            update(LessonProgress)
+            .where(LessonProgress.id == previous.c.id)
+            .values(**progress_values)
+            .returning(LessonProgress, previous.c.was_completed)
+            .execution_options(synchronize_session=False)
         ).first()
         
-        if not progress:
-            progress = LessonProgress(
-                user_id=user_id,
-                lesson_id=lesson_id,
-                **progress_data.dict()
-            )
-            db.add(progress)
+        if row is not None:
+            progress, was_completed = row
         else:
-            for field, value in progress_data.dict().items():
-                setattr(progress, field, value)
-        
-        # Marcar como completado si el progreso es 100%
-        if progress_data.progress_percentage >= 100 and not progress.is_completed:
-            progress.is_completed = True
-            progress.completed_at = datetime.utcnow()
-        
-        progress.updated_at = datetime.utcnow()
-        db.commit()
-        db.refresh(progress)
-        
-        # Actualizar progreso del curso
-        CourseService._update_course_progress(db, user_id, lesson.course_id)
+            # ON CONFLICT sobre uq_lesson_progress_user_lesson: si otro heartbeat
+            # creó la fila entre el UPDATE y el INSERT, se actualiza en su lugar
+            progress = db.execute(
+                pg_insert(LessonProgress)
+                .values(user_id=user_id, lesson_id=lesson_id, **progress_values)
+                .on_conflict_do_update(
+                    constraint="uq_lesson_progress_user_lesson",
+                    set_=progress_values
+                )
+                .returning(LessonProgress)
+            ).scalar_one()
+            was_completed = False
+        
+        # Solo se recalcula el progreso del curso cuando la lección cambia de
+        # estado; el resto de los heartbeats solo registran el último acceso
+        if bool(progress.is_completed) != bool(was_completed):
+            CourseService._update_course_progress(db, user_id, course_id)
+        else:
+            db.execute(
+                update(CourseEnrollment)
+                .where(
+                    CourseEnrollment.user_id == user_id,
+                    CourseEnrollment.course_id == course_id
+                )
+                .values(last_accessed_at=func.now())
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
         
         return progress
 
     @staticmethod
     def _update_course_progress(db: Session, user_id: int, course_id: int):
-        """Actualizar el progreso general del curso basado en las lecciones completadas"""
-        # Obtener total de lecciones del curso
-        total_lessons = db.query(Lesson).filter(
+        """Actualizar el progreso general del curso basado en las lecciones completadas
+        
+        Los dos conteos y el UPDATE del enrollment se resuelven en una sola sentencia
+        (subconsultas escalares); si el curso no tiene lecciones publicadas no se modifica nada.
+        """
+        total_lessons = select(func.count(Lesson.id)).where(
             Lesson.course_id == course_id,
             Lesson.is_published == True
-        ).count()
-        
-        if total_lessons == 0:
-            return
+        ).scalar_subquery()
         
-        # Obtener lecciones completadas por el usuario
-        completed_lessons = db.query(LessonProgress).join(Lesson).filter(
+        completed_lessons = select(func.count(LessonProgress.id)).join(
+            Lesson, Lesson.id == LessonProgress.lesson_id
+        ).where(
             LessonProgress.user_id == user_id,
             Lesson.course_id == course_id,
             LessonProgress.is_completed == True
-        ).count()
+        ).scalar_subquery()
         
-        # Calcular porcentaje de progreso
-        progress_percentage = int((completed_lessons / total_lessons) * 100)
-        
-        # Actualizar enrollment
-        enrollment = db.query(CourseEnrollment).filter(
+        stmt = update(CourseEnrollment).where(
             CourseEnrollment.user_id == user_id,
-            CourseEnrollment.course_id == course_id
-        ).first()
-        
-        if enrollment:
-            enrollment.progress_percentage = progress_percentage
-            enrollment.completed_lessons = completed_lessons
-            enrollment.last_accessed_at = datetime.utcnow()
-            db.commit()
+            CourseEnrollment.course_id == course_id,
+            total_lessons > 0
+        ).values(
+            progress_percentage=(completed_lessons * 100) // total_lessons,
+            completed_lessons=completed_lessons,
+            last_accessed_at=func.now()
+        ).execution_options(synchronize_session=False)
+        
+        db.execute(stmt)
+        db.commit()
 
     @staticmethod
     def delete_course(db: Session, course_id: int) -> bool:
@@ -473,22 +749,27 @@ class CourseService:
         - Si está publicado (is_published=True): soft delete (lo despublica)
         - Si NO está publicado (borrador): hard delete (lo elimina completamente)
         """
-        course = db.query(Course).filter(Course.id == course_id).first()
+        course = db.get(Course, course_id)
         if not course:
             return False
         
         # Si el curso nunca fue publicado, eliminarlo completamente (hard delete)
         if not course.is_published:
-            # Primero eliminar todas las lecciones de todos los capítulos
-            chapters = db.query(Chapter).filter(Chapter.course_id == course_id).all()
-            for chapter in chapters:
-                # Eliminar lesson_progress asociados a las lecciones del capítulo
-                lessons = db.query(Lesson).filter(Lesson.chapter_id == chapter.id).all()
-                for lesson in lessons:
-                    db.query(LessonProgress).filter(LessonProgress.lesson_id == lesson.id).delete()
-                    db.delete(lesson)
-                # Eliminar el capítulo
-                db.delete(chapter)
+            # Eliminar en bloque (un DELETE por tabla): progreso, lecciones y capítulos del curso
+            course_chapter_ids = select(Chapter.id).where(Chapter.course_id == course_id)
+            course_lesson_ids = select(Lesson.id).where(Lesson.chapter_id.in_(course_chapter_ids))
+            db.query(LessonProgress).filter(
+                LessonProgress.lesson_id.in_(course_lesson_ids)
+            ).delete(synchronize_session=False)
+            deleted_lesson_ids = db.execute(
+                delete(Lesson)
+                .where(Lesson.chapter_id.in_(course_chapter_ids))
+                .returning(Lesson.id)
+                .execution_options(synchronize_session=False)
+            ).scalars().all()
+            db.query(Chapter).filter(
+                Chapter.course_id == course_id
+            ).delete(synchronize_session=False)
             
             # Eliminar enrollments al curso
             db.query(CourseEnrollment).filter(CourseEnrollment.course_id == course_id).delete()
@@ -496,6 +777,7 @@ class CourseService:
             # Finalmente eliminar el curso
             db.delete(course)
             db.commit()
+            CourseService.invalidate_lesson_meta(*deleted_lesson_ids)
             return True
         
         # Si el curso está o estuvo publicado, hacer soft delete
@@ -507,33 +789,37 @@ class CourseService:
     @staticmethod
     def delete_chapter(db: Session, chapter_id: int) -> bool:
         """Eliminar un capítulo"""
-        chapter = db.query(Chapter).filter(Chapter.id == chapter_id).first()
+        chapter = db.get(Chapter, chapter_id)
         if not chapter:
             return False
         
+        lesson_ids = [lesson.id for lesson in chapter.lessons]
         db.delete(chapter)
         db.commit()
+        CourseService.invalidate_lesson_meta(*lesson_ids)
         return True
 
     @staticmethod
     def reorder_chapters(db: Session, course_id: int, chapter_ids: List[int]) -> List[Chapter]:
         """Actualizar el orden de los capítulos de un curso"""
-        chapters = db.query(Chapter).filter(Chapter.course_id == course_id).order_by(Chapter.order_index).all()
-        if not chapters:
+        existing_ids = db.execute(
+            select(Chapter.id).where(Chapter.course_id == course_id)
+        ).scalars().all()
+        if not existing_ids:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Course not found or has no chapters")
 
-        existing_ids = [chapter.id for chapter in chapters]
-        if sorted(existing_ids) != sorted(chapter_ids):
+        # Misma cantidad y mismos ids (la longitud también descarta ids repetidos)
+        if len(existing_ids) != len(chapter_ids) or set(existing_ids) != set(chapter_ids):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Chapter IDs do not match course chapters")
 
-        chapter_map = {chapter.id: chapter for chapter in chapters}
-        for position, chapter_id in enumerate(chapter_ids, start=1):
-            chapter = chapter_map.get(chapter_id)
-            if chapter is None:
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Chapter {chapter_id} does not belong to course")
-            chapter.order_index = position
-            chapter.updated_at = datetime.utcnow()
-
+        # Un solo UPDATE ... FROM (VALUES ...) en lugar de un UPDATE por capítulo
+        new_order = _order_values(chapter_ids)
+        db.execute(
+            update(Chapter)
+            .where(Chapter.id == new_order.c.id, Chapter.course_id == course_id)
+            .values(order_index=new_order.c.pos, updated_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
         db.commit()
 
         return db.query(Chapter).filter(Chapter.course_id == course_id).order_by(Chapter.order_index).all()
@@ -541,32 +827,34 @@ class CourseService:
     @staticmethod
     def reorder_lessons(db: Session, chapter_id: int, lesson_ids: List[int]) -> List[Lesson]:
         """Actualizar el orden de las lecciones de un capítulo"""
-        lessons = db.query(Lesson).filter(Lesson.chapter_id == chapter_id).order_by(Lesson.order_index).all()
-        if not lessons:
+        existing_ids = db.execute(
+            select(Lesson.id).where(Lesson.chapter_id == chapter_id)
+        ).scalars().all()
+        if not existing_ids:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Chapter not found or has no lessons")
 
-        existing_ids = [lesson.id for lesson in lessons]
-        if sorted(existing_ids) != sorted(lesson_ids):
+        # Misma cantidad y mismos ids (la longitud también descarta ids repetidos)
+        if len(existing_ids) != len(lesson_ids) or set(existing_ids) != set(lesson_ids):
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Lesson IDs do not match chapter lessons")
 
-        lesson_map = {lesson.id: lesson for lesson in lessons}
-        for position, lesson_id in enumerate(lesson_ids, start=1):
-            lesson = lesson_map.get(lesson_id)
-            if lesson is None:
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Lesson {lesson_id} does not belong to chapter")
-            lesson.order_index = position
-            lesson.updated_at = datetime.utcnow()
-
+        # Un solo UPDATE ... FROM (VALUES ...) en lugar de un UPDATE por lección
+        new_order = _order_values(lesson_ids)
+        db.execute(
+            update(Lesson)
+            .where(Lesson.id == new_order.c.id, Lesson.chapter_id == chapter_id)
+            .values(order_index=new_order.c.pos, updated_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
         db.commit()
 
         return db.query(Lesson).filter(Lesson.chapter_id == chapter_id).order_by(Lesson.order_index).all()
 
     @staticmethod
-    def delete_lesson(db: Session, lesson_id: int) -> bool:
-        """Eliminar una lección y todos sus registros de progreso asociados"""
+    def delete_lesson(db: Session, lesson_id: int, background_tasks: Optional[BackgroundTasks] = None) -> bool:
+        """Eliminar una lección, todos sus registros de progreso asociados y sus archivos en R2"""
         from app.db.models import LessonProgress
         
-        lesson = db.query(Lesson).filter(Lesson.id == lesson_id).first()
+        lesson = db.get(Lesson, lesson_id)
         if not lesson:
             return False
         
@@ -579,39 +867,26 @@ class CourseService:
             db.rollback()
             raise
         
-        # SEGUNDO: Intentar eliminar archivos asociados en R2 si existen
-        try:
-            from urllib.parse import urlparse
-            def _extract_key(url: str) -> str:
-                if not url:
-                    return ''
-                path = urlparse(url).path.lstrip('/') if (url.startswith('http://') or url.startswith('https://')) else url
-                # Quitar prefijo de bucket si está presente
-                from app.core.config import settings as _settings
-                bucket_prefix = f"{_settings.R2_BUCKET_NAME}/"
-                if path.startswith(bucket_prefix):
-                    path = path[len(bucket_prefix):]
-                # Fallback: mantener desde 'courses/...'
-                idx = path.rfind('/courses/')
-                if idx != -1:
-                    path = path[idx+1:]
-                return path
-
-            if lesson.file_url:
-                key = _extract_key(lesson.file_url)
-                if key:
-                    r2_service.delete_object(key)
-            if lesson.video_url:
-                keyv = _extract_key(lesson.video_url)
-                if keyv:
-                    r2_service.delete_object(keyv)
-        except Exception as e:
-            print(f"Error eliminando archivos de R2: {e}")
-            # No fallar si no se pueden eliminar los archivos
+        # SEGUNDO: Calcular las keys de R2 antes de eliminar la lección
+        object_keys = [
+            key for key in (
+                _object_key_from_url(lesson.file_url),
+                _object_key_from_url(lesson.video_url)
+            ) if key
+        ]
 
         # TERCERO: Eliminar la lección
         db.delete(lesson)
         db.commit()
+        CourseService.invalidate_lesson_meta(lesson_id)
+
+        # CUARTO: Eliminar archivos asociados en R2 (no falla la operación si no se puede).
+        # Con BackgroundTasks se hace después de enviar la respuesta, en un único DeleteObjects.
+        if object_keys:
+            if background_tasks is not None:
+                background_tasks.add_task(r2_service.delete_objects, object_keys)
+            else:
+                r2_service.delete_objects(object_keys)
         return True
 
 course_service = CourseService()
@@ -1,7 +1,22 @@
+from typing import Dict, Optional
 from sqlalchemy.orm import Session
 from app.db.session import SessionLocal
 from app.db.models import Role, User
 
+# {nombre_rol: id}. Los roles no cambian en runtime: se cargan una sola vez por proceso
+ROLE_IDS: Dict[str, int] = {}
+
+def load_role_ids(db: Session) -> None:
+    """(Re)cargar ROLE_IDS con una sola consulta a roles"""
+    ROLE_IDS.clear()
+    ROLE_IDS.update({name: role_id for name, role_id in db.query(Role.name, Role.id).all()})
+
+def get_role_id(db: Session, name: str) -> Optional[int]:
+    """Obtener el id de un rol por nombre; solo consulta la tabla roles si no está cacheado"""
+    if name not in ROLE_IDS:
+        load_role_ids(db)
+    return ROLE_IDS.get(name)
+
 def init_db():
     """Inicializar base de datos con datos básicos"""
     db: Session = SessionLocal()
@@ -27,6 +42,7 @@ def init_db():
             print("✅ Rol 'alumno' creado")
         
         db.commit()
+        load_role_ids(db)
         print("✅ Base de datos inicializada correctamente")
         
     except Exception as e:
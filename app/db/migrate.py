@@ -0,0 +1,41 @@
+import logging
+import os
+from typing import Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger("uvicorn.error")
+
+# Estado de las migraciones en este proceso (expuesto en /health)
+# state: skipped | running | done | failed
+MIGRATION_STATUS: Dict[str, Optional[str]] = {"mode": None, "state": "skipped", "error": None}
+
+
+def run_db_migrations() -> bool:
+    """Correr las migraciones de Alembic hasta head usando la API de Alembic.
+
+    Alembic se importa acá adentro: los workers que no migran (MIGRATION_MODE=skip)
+    nunca lo cargan. Devuelve True si el upgrade terminó bien.
+    """
+    MIGRATION_STATUS.update(state="running", error=None)
+    try:
+        from alembic import command
+        from alembic.config import Config
+        # Resolve path to alembic.ini at project root (two levels up from app/db/)
+        project_root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
+        alembic_ini = os.path.join(project_root, "alembic.ini")
+
+        cfg = Config(alembic_ini)
+        # Ensure the runtime DB URL is used (Railway env)
+        if getattr(settings, "DATABASE_URL", None):
+            cfg.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
+
+        logger.info("[migrations] Running alembic upgrade head")
+        command.upgrade(cfg, "head")
+        logger.info("[migrations] Alembic upgrade completed")
+        MIGRATION_STATUS["state"] = "done"
+        return True
+    except Exception as e:
+        logger.error(f"[migrations] Alembic upgrade failed: {e}")
+        MIGRATION_STATUS.update(state="failed", error=str(e))
+        return False
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, BigInteger, Table
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, BigInteger, Table, Index, UniqueConstraint, literal_column, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -10,7 +10,9 @@ post_tags = Table(
     'post_tags',
     Base.metadata,
     Column('post_id', Integer, ForeignKey('posts.id'), primary_key=True),
-    Column('tag_id', Integer, ForeignKey('tags.id'), primary_key=True)
+    Column('tag_id', Integer, ForeignKey('tags.id'), primary_key=True),
+    # La PK (post_id, tag_id) cubre post -> tags; este índice cubre tag -> posts
+    Index('ix_post_tags_tag_post', 'tag_id', 'post_id')
 )
 
 class Role(Base):
@@ -31,8 +33,8 @@ class User(Base):
     google_id = Column(String(100), unique=True, nullable=False)
     name = Column(String(255), nullable=False)
     avatar_url = Column(String(500))
-    is_active = Column(Boolean, default=True)
-    has_premium_access = Column(Boolean, default=False)  # Nuevo: Acceso premium
+    is_active = Column(Boolean, default=True, server_default=text('true'))
+    has_premium_access = Column(Boolean, default=False, server_default=text('false'))  # Nuevo: Acceso premium
     role_id = Column(Integer, ForeignKey("roles.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -41,6 +43,11 @@ class User(Base):
     role = relationship("Role", back_populates="users")
     posts = relationship("Post", back_populates="author")
     # enrollments = relationship("CourseEnrollment", back_populates="user")  # Temporalmente comentado
+    
+    # Listado de admin paginado por keyset: ORDER BY created_at DESC, id DESC
+    __table_args__ = (
+        Index('ix_users_created_at_id', created_at.desc(), id.desc()),
+    )
 
 class Category(Base):
     __tablename__ = "categories"
@@ -78,22 +85,44 @@ class Post(Base):
     featured_image_object_key = Column(String(500))  # Para manejo de R2
     meta_title = Column(String(60))  # SEO
     meta_description = Column(String(160))  # SEO
-    is_published = Column(Boolean, default=False)
-    is_featured = Column(Boolean, default=False)  # Post destacado
+    is_published = Column(Boolean, default=False, server_default=text('false'))
+    is_featured = Column(Boolean, default=False, server_default=text('false'))  # Post destacado
     published_at = Column(DateTime(timezone=True))
     reading_time_minutes = Column(Integer)  # Tiempo estimado de lectura
-    views_count = Column(Integer, default=0)
+    views_count = Column(Integer, default=0, server_default=text('0'))
     
-    author_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    category_id = Column(Integer, ForeignKey("categories.id"))
+    author_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    category_id = Column(Integer, ForeignKey("categories.id"), index=True)
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
-    # Relaciones
-    author = relationship("User", back_populates="posts")
-    category = relationship("Category", back_populates="posts")
-    tags = relationship("Tag", secondary=post_tags, back_populates="posts")
+    # Relaciones (se leen en todos los listados: selectin evita N+1)
+    author = relationship("User", back_populates="posts", lazy="selectin")
+    category = relationship("Category", back_populates="posts", lazy="selectin")
+    tags = relationship("Tag", secondary=post_tags, back_populates="posts", lazy="selectin")
+    
+    # published_at crece con el orden de inserción: BRIN basta para filtros por rango
+    # ("posts recientes") y ocupa unas pocas páginas
+    __table_args__ = (
+        Index('ix_posts_published_at_brin', 'published_at', postgresql_using='brin'),
+        # Listado público paginado por keyset: WHERE is_published = true ORDER BY created_at DESC, id DESC.
+        # Parcial (sin borradores) y cubriente: las columnas que carga PostService.get_posts
+        # van en INCLUDE para que el listado sea un index-only scan
+        Index(
+            'ix_posts_listing',
+            created_at.desc(),
+            id.desc(),
+            postgresql_include=['title', 'author_id', 'updated_at', 'is_published'],
+            postgresql_where=text('is_published = true')
+        ),
+        # Búsqueda full-text (PostService.search_posts usa exactamente esta expresión)
+        Index(
+            'ix_posts_fts',
+            func.to_tsvector(literal_column("'spanish'::regconfig"), title + literal_column("' '") + content),
+            postgresql_using='gin'
+        ),
+    )
 
 class Course(Base):
     __tablename__ = "courses"
@@ -109,8 +138,8 @@ class Course(Base):
     category = Column(String(100))  # Categoría del curso
     tags = Column(Text)  # Tags separados por comas
     estimated_duration_hours = Column(Integer)  # Duración estimada total
-    is_published = Column(Boolean, default=False)
-    is_premium = Column(Boolean, default=True)
+    is_published = Column(Boolean, default=False, server_default=text('false'))
+    is_premium = Column(Boolean, default=True, server_default=text('true'))
     price = Column(String(50))
     instructor_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -128,14 +157,14 @@ class Chapter(Base):
     title = Column(String(255), nullable=False)
     description = Column(Text)
     order_index = Column(Integer, nullable=False)  # Orden dentro del curso
-    is_published = Column(Boolean, default=False)
+    is_published = Column(Boolean, default=False, server_default=text('false'))
     course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relaciones
     course = relationship("Course", back_populates="chapters")
-    lessons = relationship("Lesson", back_populates="chapter", cascade="all, delete-orphan", order_by="Lesson.order_index")
+    lessons = relationship("Lesson", back_populates="chapter", cascade="all, delete-orphan", order_by="Lesson.order_index", lazy="selectin")
 
 class Lesson(Base):
     __tablename__ = "lessons"
@@ -162,12 +191,13 @@ class Lesson(Base):
     # Metadatos
     order_index = Column(Integer, nullable=False)  # Orden dentro del capítulo
     estimated_duration_minutes = Column(Integer)  # Duración estimada
-    is_published = Column(Boolean, default=False)
-    is_free = Column(Boolean, default=False)  # Preview gratuito
-    can_download = Column(Boolean, default=False)  # Permitir descarga de archivos
+    is_published = Column(Boolean, default=False, server_default=text('false'))
+    is_free = Column(Boolean, default=False, server_default=text('false'))  # Preview gratuito
+    can_download = Column(Boolean, default=False, server_default=text('false'))  # Permitir descarga de archivos
     
     # Relaciones
-    chapter_id = Column(Integer, ForeignKey("chapters.id"), nullable=False)
+    chapter_id = Column(Integer, ForeignKey("chapters.id"), nullable=False, index=True)
+    # Indexado por ix_lessons_course_id_is_published (columna líder)
     course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)  # Redundante pero útil para consultas
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -176,17 +206,22 @@ class Lesson(Base):
     chapter = relationship("Chapter", back_populates="lessons")
     course = relationship("Course")
     progress = relationship("LessonProgress", back_populates="lesson")
+    
+    __table_args__ = (
+        Index('ix_lessons_course_id_is_published', 'course_id', 'is_published'),
+    )
 
 class LessonProgress(Base):
     __tablename__ = "lesson_progress"
     
     id = Column(Integer, primary_key=True, index=True)
+    # user_id ya es columna líder de ix_lesson_progress_user_id_lesson_id_is_completed
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    lesson_id = Column(Integer, ForeignKey("lessons.id"), nullable=False)
-    is_completed = Column(Boolean, default=False)
-    progress_percentage = Column(Integer, default=0)  # 0-100
-    time_spent_seconds = Column(Integer, default=0)  # Tiempo total visto
-    last_position_seconds = Column(Integer, default=0)  # Última posición en videos
+    lesson_id = Column(Integer, ForeignKey("lessons.id"), nullable=False, index=True)
+    is_completed = Column(Boolean, default=False, server_default=text('false'))
+    progress_percentage = Column(Integer, default=0, server_default=text('0'))  # 0-100
+    time_spent_seconds = Column(Integer, default=0, server_default=text('0'))  # Tiempo total visto
+    last_position_seconds = Column(Integer, default=0, server_default=text('0'))  # Última posición en videos
     completed_at = Column(DateTime(timezone=True))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -194,8 +229,10 @@ class LessonProgress(Base):
     # Relaciones
     lesson = relationship("Lesson", back_populates="progress")
     
-    # Constraint para evitar duplicados
+    # Constraint para evitar duplicados (su índice es también el camino de lookup por usuario y lección)
     __table_args__ = (
+        UniqueConstraint('user_id', 'lesson_id', name='uq_lesson_progress_user_lesson'),
+        Index('ix_lesson_progress_user_id_lesson_id_is_completed', 'user_id', 'lesson_id', 'is_completed'),
         {'extend_existing': True},
     )
 
@@ -203,17 +240,17 @@ class CourseEnrollment(Base):
     __tablename__ = "course_enrollments"
     
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False)
-    has_access = Column(Boolean, default=False)  # Control manual de acceso
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False, index=True)
+    has_access = Column(Boolean, default=False, server_default=text('false'))  # Control manual de acceso
     enrollment_date = Column(DateTime(timezone=True), server_default=func.now())
     access_granted_date = Column(DateTime(timezone=True))
     access_granted_by = Column(Integer, ForeignKey("users.id"))  # Admin que otorgó acceso
     
     # Progreso del curso
-    progress_percentage = Column(Integer, default=0)  # 0-100
-    completed_lessons = Column(Integer, default=0)
-    total_time_spent_seconds = Column(Integer, default=0)
+    progress_percentage = Column(Integer, default=0, server_default=text('0'))  # 0-100
+    completed_lessons = Column(Integer, default=0, server_default=text('0'))
+    total_time_spent_seconds = Column(Integer, default=0, server_default=text('0'))
     last_accessed_at = Column(DateTime(timezone=True))
     
     # Relaciones con foreign_keys explícitos para evitar ambigüedad
@@ -223,6 +260,16 @@ class CourseEnrollment(Base):
     
     # Constraint para evitar enrollments duplicados
     __table_args__ = (
+        Index(
+            'ix_course_enrollments_user_id_course_id_access', 'user_id', 'course_id',
+            postgresql_where=text('has_access = true')
+        ),
+        # Un enrollment por usuario y curso (course_id = 0 registra accesos premium globales)
+        Index(
+            'uq_course_enrollments_user_id_course_id', 'user_id', 'course_id',
+            unique=True,
+            postgresql_where=text('course_id <> 0')
+        ),
         {'extend_existing': True},
     )
 
@@ -237,11 +284,17 @@ class HomepageContent(Base):
     image_url = Column(String(500))
     button_text = Column(String(100))
     button_url = Column(String(255))
-    order_index = Column(Integer, default=0)
-    is_active = Column(Boolean, default=True)
+    order_index = Column(Integer, default=0, server_default=text('0'))
+    is_active = Column(Boolean, default=True, server_default=text('true'))
     extra_data = Column(Text)  # JSON para datos adicionales específicos de cada sección
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Lecturas del homepage: WHERE section/is_active ... ORDER BY order_index
+    __table_args__ = (
+        Index('ix_homepage_content_section_active_order', 'section', 'is_active', 'order_index'),
+        {'extend_existing': True},
+    )
 
 class HomepageGallery(Base):
     __tablename__ = "homepage_gallery"
@@ -251,9 +304,21 @@ class HomepageGallery(Base):
     description = Column(Text)
     image_url = Column(String(500), nullable=False)
     category = Column(String(100))  # 'project', 'certificate', 'achievement', etc.
-    order_index = Column(Integer, default=0)
-    is_featured = Column(Boolean, default=False)
-    is_active = Column(Boolean, default=True)
+    order_index = Column(Integer, default=0, server_default=text('0'))
+    is_featured = Column(Boolean, default=False, server_default=text('false'))
+    is_active = Column(Boolean, default=True, server_default=text('true'))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    
+    # Lecturas de la galería: WHERE is_active [AND is_featured | AND category] ORDER BY order_index
+    __table_args__ = (
+        Index('ix_homepage_gallery_active_featured_order', 'is_active', 'is_featured', 'order_index'),
+        Index('ix_homepage_gallery_category_active_order', 'category', 'is_active', 'order_index'),
+        # Destacados del homepage público: solo indexa las pocas filas activas y destacadas
+        Index(
+            'ix_gallery_featured_order', 'order_index',
+            postgresql_where=text('is_active AND is_featured')
+        ),
+        {'extend_existing': True},
+    )
 
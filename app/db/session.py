@@ -1,21 +1,30 @@
 from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from app.core.config import settings
 
-# Create engine with safer defaults for cloud DBs
+# Create engine with safer defaults for cloud DBs.
+# LIFO keeps the most recently used connections warm and lets overflow ones idle out.
 engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
     pool_recycle=300,
+    pool_use_lifo=True,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    # Cache de SQL compilado por engine (default 500): cubre todas las
+    # formas de consulta de la app sin desalojos
+    query_cache_size=settings.DB_QUERY_CACHE_SIZE,
 )
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
-
 def get_db():
-    """Dependency para obtener sesión de base de datos"""
+    """Dependency para obtener sesión de base de datos.
+
+    FastAPI la resuelve una sola vez por request: require_admin/get_current_user
+    y la ruta comparten la misma sesión (y la misma conexión del pool).
+    """
     db = SessionLocal()
     try:
         yield db
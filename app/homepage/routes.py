@@ -1,17 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from fastapi import APIRouter, Depends, HTTPException, Response, status, UploadFile, File
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
+from dataclasses import dataclass
+from pydantic import TypeAdapter
 from typing import List, Optional
 import logging
+import time
 
 from app.db.session import get_db
-from app.db.models import HomepageContent, HomepageGallery, User
+from app.db.models import User
 from app.auth.dependencies import require_admin
 from app.homepage.service import homepage_service
 from app.core.config import settings
 from app.homepage.schemas import (
     HomepageContentCreate, HomepageContentUpdate, HomepageContentResponse,
     HomepageGalleryCreate, HomepageGalleryUpdate, HomepageGalleryResponse,
-    HomepageData
+    HomepageData, UsersCountResponse
 )
 from app.storage.r2 import r2_service
 
@@ -19,43 +23,119 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Cache en memoria de GET / : {versión: (expira_en, json_bytes)}
+HOMEPAGE_CACHE_TTL_SECONDS = 30
+_homepage_cache: dict = {}
+
+# Serializadores de listas precompilados: una sola pasada a bytes JSON, sin el
+# round-trip de validación de response_model por item
+_content_list_adapter = TypeAdapter(List[HomepageContentResponse])
+_gallery_list_adapter = TypeAdapter(List[HomepageGalleryResponse])
+
+# Cache en memoria de GET /users-count: (expira_en, count)
+USERS_COUNT_CACHE_TTL_SECONDS = 60
+_users_count_cache: tuple = (0.0, None)
+
+# Snapshot de la configuración de R2 para los endpoints de debug: (expira_en, snapshot)
+R2_SNAPSHOT_TTL_SECONDS = 10
+_r2_snapshot_cache: tuple = (0.0, None)
+
+
+@dataclass(frozen=True)
+class _R2Snapshot:
+    """Estado de la configuración de R2 leído una sola vez"""
+    r2_enabled: bool
+    has_client: bool
+    bucket_name: str
+    public_url: str
+    public_bucket_name: str
+    public_bucket_url: str
+    has_endpoint: bool
+    has_access_key: bool
+    has_secret_key: bool
+    endpoint_preview: Optional[str]
+
+
+def _r2_snapshot() -> _R2Snapshot:
+    """Snapshot de la configuración de R2, recalculado como mucho cada R2_SNAPSHOT_TTL_SECONDS"""
+    global _r2_snapshot_cache
+    expires_at, snapshot = _r2_snapshot_cache
+    if snapshot is None or time.monotonic() >= expires_at:
+        endpoint = settings.R2_ENDPOINT_URL
+        snapshot = _R2Snapshot(
+            r2_enabled=r2_service.enabled,
+            has_client=r2_service.client is not None,
+            bucket_name=r2_service.bucket_name,
+            public_url=r2_service.public_url,
+            public_bucket_name=r2_service.public_bucket_name,
+            public_bucket_url=r2_service.public_bucket_url,
+            has_endpoint=bool(endpoint),
+            has_access_key=bool(settings.R2_ACCESS_KEY_ID),
+            has_secret_key=bool(settings.R2_SECRET_ACCESS_KEY),
+            # Mostrar solo los primeros/últimos caracteres para debug
+            endpoint_preview=endpoint[:20] + "..." + endpoint[-10:] if endpoint else None,
+        )
+        _r2_snapshot_cache = (time.monotonic() + R2_SNAPSHOT_TTL_SECONDS, snapshot)
+    return snapshot
+
 @router.get("/debug-r2-public")
 async def debug_r2_config_public():
     """Debug R2 configuration - PUBLIC ENDPOINT - TEMPORARY"""
-    from app.core.config import settings
+    snapshot = _r2_snapshot()
     return {
-        "r2_enabled": r2_service.enabled,
-        "has_client": r2_service.client is not None,
-        "bucket_name": bool(r2_service.bucket_name),
-        "public_url": bool(r2_service.public_url),
-        "public_bucket_name": bool(r2_service.public_bucket_name),
-        "public_bucket_url": bool(r2_service.public_bucket_url),
-        "has_endpoint": bool(settings.R2_ENDPOINT_URL),
-        "has_access_key": bool(settings.R2_ACCESS_KEY_ID),
-        "has_secret_key": bool(settings.R2_SECRET_ACCESS_KEY),
-        # Mostrar solo los primeros/últimos caracteres para debug
-        "endpoint_preview": settings.R2_ENDPOINT_URL[:20] + "..." + settings.R2_ENDPOINT_URL[-10:] if settings.R2_ENDPOINT_URL else None,
-        "bucket_preview": r2_service.bucket_name if r2_service.bucket_name else None,
-        "public_bucket_preview": r2_service.public_bucket_name if r2_service.public_bucket_name else None,
+        "r2_enabled": snapshot.r2_enabled,
+        "has_client": snapshot.has_client,
+        "bucket_name": bool(snapshot.bucket_name),
+        "public_url": bool(snapshot.public_url),
+        "public_bucket_name": bool(snapshot.public_bucket_name),
+        "public_bucket_url": bool(snapshot.public_bucket_url),
+        "has_endpoint": snapshot.has_endpoint,
+        "has_access_key": snapshot.has_access_key,
+        "has_secret_key": snapshot.has_secret_key,
+        "endpoint_preview": snapshot.endpoint_preview,
+        "bucket_preview": snapshot.bucket_name or None,
+        "public_bucket_preview": snapshot.public_bucket_name or None,
     }
 
 # ===== ENDPOINTS PÚBLICOS =====
 
 @router.get("/", response_model=HomepageData)
 async def get_homepage_data(db: Session = Depends(get_db)):
-    """Obtener todos los datos del homepage para la página pública"""
-    content = homepage_service.get_all_content(db)
-    gallery = homepage_service.get_all_gallery(db, featured_only=True)
+    """Obtener todos los datos del homepage para la página pública
     
-    return HomepageData(
-        content=[HomepageContentResponse.from_orm(c) for c in content],
-        gallery=[HomepageGalleryResponse.from_orm(g) for g in gallery]
-    )
+    La respuesta ya serializada se cachea en memoria por versión de los datos
+    (cambia con cada escritura de admin en este proceso) y con un TTL corto
+    como red de seguridad para las escrituras hechas en otros workers.
+    """
+    version = homepage_service.version
+    cached = _homepage_cache.get(version)
+    if cached and time.monotonic() < cached[0]:
+        return Response(content=cached[1], media_type="application/json")
+    
+    # Contenido y galería destacada en una sola consulta; filas de Core construidas
+    # sin validación: vienen de la base con los tipos correctos
+    content, gallery = homepage_service.get_public_homepage_rows(db)
+    
+    body = HomepageData.model_construct(
+        content=[HomepageContentResponse.model_construct(**c) for c in content],
+        gallery=[HomepageGalleryResponse.model_construct(**g) for g in gallery]
+    ).model_dump_json().encode()
+    
+    _homepage_cache.clear()
+    _homepage_cache[version] = (time.monotonic() + HOMEPAGE_CACHE_TTL_SECONDS, body)
+    return Response(content=body, media_type="application/json")
 
-@router.get("/users-count")
+@router.get("/users-count", response_model=UsersCountResponse)
 async def get_users_count_public(db: Session = Depends(get_db)):
-    """Obtener el número total de usuarios registrados (endpoint público)"""
-    count = db.query(User).count()
+    """Obtener el número total de usuarios registrados (endpoint público)
+    
+    SELECT count(*) directo (sin el subquery de Query.count()), memoizado en memoria.
+    """
+    global _users_count_cache
+    expires_at, count = _users_count_cache
+    if count is None or time.monotonic() >= expires_at:
+        count = db.execute(select(func.count()).select_from(User.__table__)).scalar_one()
+        _users_count_cache = (time.monotonic() + USERS_COUNT_CACHE_TTL_SECONDS, count)
     return {"count": count}
 
 @router.get("/content/{section}", response_model=HomepageContentResponse)
@@ -74,11 +154,14 @@ async def get_gallery(
 ):
     """Obtener galería de imágenes"""
     if category:
-        gallery = homepage_service.get_gallery_by_category(db, category)
+        gallery = homepage_service.get_gallery_by_category_core(db, category)
     else:
-        gallery = homepage_service.get_all_gallery(db, featured_only)
+        gallery = homepage_service.get_all_gallery_core(db, featured_only)
     
-    return [HomepageGalleryResponse.from_orm(g) for g in gallery]
+    return Response(
+        content=_gallery_list_adapter.dump_json([HomepageGalleryResponse.model_construct(**g) for g in gallery]),
+        media_type="application/json"
+    )
 
 # ===== ENDPOINTS DE ADMINISTRACIÓN =====
 
@@ -87,16 +170,17 @@ async def debug_r2_config(
     _: dict = Depends(require_admin)
 ):
     """Debug R2 configuration - TEMPORARY ENDPOINT"""
+    snapshot = _r2_snapshot()
     return {
-        "r2_enabled": r2_service.enabled,
-        "has_client": r2_service.client is not None,
-        "bucket_name": r2_service.bucket_name,
-        "public_url": r2_service.public_url,
-        "public_bucket_name": r2_service.public_bucket_name,
-        "public_bucket_url": r2_service.public_bucket_url,
-        "has_endpoint": bool(settings.R2_ENDPOINT_URL),
-        "has_access_key": bool(settings.R2_ACCESS_KEY_ID),
-        "has_secret_key": bool(settings.R2_SECRET_ACCESS_KEY),
+        "r2_enabled": snapshot.r2_enabled,
+        "has_client": snapshot.has_client,
+        "bucket_name": snapshot.bucket_name,
+        "public_url": snapshot.public_url,
+        "public_bucket_name": snapshot.public_bucket_name,
+        "public_bucket_url": snapshot.public_bucket_url,
+        "has_endpoint": snapshot.has_endpoint,
+        "has_access_key": snapshot.has_access_key,
+        "has_secret_key": snapshot.has_secret_key,
     }
 
 @router.get("/admin/content", response_model=List[HomepageContentResponse])
@@ -105,8 +189,11 @@ async def get_all_content_admin(
     db: Session = Depends(get_db)
 ):
     """Obtener todo el contenido para administración"""
-    content = db.query(HomepageContent).all()  # Incluir inactivos
-    return [HomepageContentResponse.from_orm(c) for c in content]
+    content = homepage_service.get_all_content_core(db, include_inactive=True)  # Incluir inactivos
+    return Response(
+        content=_content_list_adapter.dump_json([HomepageContentResponse.model_construct(**c) for c in content]),
+        media_type="application/json"
+    )
 
 @router.post("/admin/content", response_model=HomepageContentResponse)
 async def create_content(
@@ -129,7 +216,7 @@ async def update_content(
     db_content = homepage_service.update_content(db, content_id, content)
     if not db_content:
         raise HTTPException(status_code=404, detail="Contenido no encontrado")
-    return HomepageContentResponse.from_orm(db_content)
+    return HomepageContentResponse.model_construct(**db_content)
 
 @router.delete("/admin/content/{content_id}")
 async def delete_content(
@@ -151,8 +238,11 @@ async def get_all_gallery_admin(
     db: Session = Depends(get_db)
 ):
     """Obtener toda la galería para administración"""
-    gallery = db.query(HomepageGallery).all()
-    return [HomepageGalleryResponse.from_orm(g) for g in gallery]
+    gallery = homepage_service.get_all_gallery_core(db, include_inactive=True)
+    return Response(
+        content=_gallery_list_adapter.dump_json([HomepageGalleryResponse.model_construct(**g) for g in gallery]),
+        media_type="application/json"
+    )
 
 @router.post("/admin/gallery", response_model=HomepageGalleryResponse)
 async def create_gallery_item(
@@ -175,7 +265,7 @@ async def update_gallery_item(
     db_gallery = homepage_service.update_gallery_item(db, gallery_id, gallery)
     if not db_gallery:
         raise HTTPException(status_code=404, detail="Item de galería no encontrado")
-    return HomepageGalleryResponse.from_orm(db_gallery)
+    return HomepageGalleryResponse.model_construct(**db_gallery)
 
 @router.delete("/admin/gallery/{gallery_id}")
 async def delete_gallery_item(
@@ -208,13 +298,10 @@ async def upload_homepage_image(
         unique_filename = f"{uuid.uuid4()}.{file_extension}"
         object_key = f"homepage/{unique_filename}"
         
-        # Leer el contenido del archivo
-        content = await file.read()
-        
-        # Subir a R2
+        # Subir a R2 en streaming desde el archivo temporal (sin cargarlo entero en memoria)
         success, public_url = await r2_service.upload_file_to_public_bucket(
             object_key=object_key,
-            content=content,
+            content=file.file,
             content_type=file.content_type
         )
         
@@ -70,4 +70,8 @@ class HomepageGalleryResponse(HomepageGalleryBase):
 # Esquema completo para la homepage
 class HomepageData(BaseModel):
     content: List[HomepageContentResponse]
-    gallery: List[HomepageGalleryResponse]
\ No newline at end of file
+    gallery: List[HomepageGalleryResponse]
+
+# Conteo público de usuarios
+class UsersCountResponse(BaseModel):
+    count: int
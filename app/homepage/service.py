@@ -1,13 +1,34 @@
+from sqlalchemy import Boolean, String, Text, bindparam, cast, literal, null, select, union_all, update
+from sqlalchemy.engine import RowMapping
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from app.db.models import HomepageContent, HomepageGallery
 from app.homepage.schemas import (
     HomepageContentCreate, HomepageContentUpdate,
     HomepageGalleryCreate, HomepageGalleryUpdate
 )
 
+# Sentencia fija reutilizada en cada llamada: la sección va como bindparam, así
+# la clave del cache de compilación del engine es siempre la misma
+_content_by_section_stmt = (
+    select(HomepageContent)
+    .where(
+        HomepageContent.section == bindparam('section'),
+        HomepageContent.is_active == True
+    )
+    .limit(1)
+)
+
 class HomepageService:
     
+    def __init__(self):
+        # Versión de los datos públicos: cambia con cada escritura de admin y
+        # sirve de clave para el cache en memoria del endpoint público
+        self.version = 0
+    
+    def _bump_version(self) -> None:
+        self.version += 1
+    
     # ===== HOMEPAGE CONTENT =====
     
     def get_all_content(self, db: Session) -> List[HomepageContent]:
@@ -16,45 +37,116 @@ class HomepageService:
             HomepageContent.is_active == True
         ).order_by(HomepageContent.order_index).all()
     
+    def get_all_content_core(self, db: Session, include_inactive: bool = False) -> List[RowMapping]:
+        """Igual que get_all_content pero con Core: devuelve mappings sin hidratar objetos ORM
+        
+        Con include_inactive=True devuelve todo (sin orden), como el listado de admin.
+        """
+        table = HomepageContent.__table__
+        stmt = select(table)
+        if not include_inactive:
+            stmt = stmt.where(table.c.is_active == True).order_by(table.c.order_index)
+        return db.execute(stmt).mappings().all()
+    
     def get_content_by_section(self, db: Session, section: str) -> Optional[HomepageContent]:
         """Obtener contenido por sección"""
-        return db.query(HomepageContent).filter(
-            HomepageContent.section == section,
-            HomepageContent.is_active == True
-        ).first()
+        return db.execute(_content_by_section_stmt, {'section': section}).scalars().first()
     
     def create_content(self, db: Session, content: HomepageContentCreate) -> HomepageContent:
         """Crear nuevo contenido del homepage"""
         db_content = HomepageContent(**content.dict())
         db.add(db_content)
         db.commit()
+        self._bump_version()
         db.refresh(db_content)
         return db_content
     
-    def update_content(self, db: Session, content_id: int, content: HomepageContentUpdate) -> Optional[HomepageContent]:
-        """Actualizar contenido existente"""
-        db_content = db.query(HomepageContent).filter(HomepageContent.id == content_id).first()
-        if not db_content:
-            return None
+    def update_content(self, db: Session, content_id: int, content: HomepageContentUpdate) -> Optional[RowMapping]:
+        """Actualizar contenido existente
         
+        Un único UPDATE ... RETURNING (sin cargar ni refrescar el objeto ORM);
+        devuelve la fila actualizada como mapping o None si no existe.
+        """
+        table = HomepageContent.__table__
         update_data = content.dict(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(db_content, key, value)
+        if not update_data:
+            return db.execute(select(table).where(table.c.id == content_id)).mappings().first()
+        
+        row = db.execute(
+            update(table).where(table.c.id == content_id).values(**update_data).returning(*table.c)
+        ).mappings().first()
+        if row is None:
+            return None
         
         db.commit()
-        db.refresh(db_content)
-        return db_content
+        self._bump_version()
+        return row
     
     def delete_content(self, db: Session, content_id: int) -> bool:
-        """Eliminar contenido (soft delete)"""
-        db_content = db.query(HomepageContent).filter(HomepageContent.id == content_id).first()
-        if not db_content:
+        """Eliminar contenido (soft delete) con un único UPDATE ... RETURNING"""
+        deleted_id = db.execute(
+            update(HomepageContent)
+            .where(HomepageContent.id == content_id)
+            .values(is_active=False)
+            .returning(HomepageContent.id)
+        ).scalar_one_or_none()
+        if deleted_id is None:
             return False
         
-        db_content.is_active = False
         db.commit()
+        self._bump_version()
         return True
     
+    # ===== HOMEPAGE PÚBLICO (contenido + galería destacada) =====
+    
+    def get_public_homepage_rows(self, db: Session) -> Tuple[List[dict], List[dict]]:
+        """Contenido activo y galería destacada en un solo round-trip (UNION ALL)
+        
+        Ambas partes se proyectan sobre las mismas columnas (con NULL donde no
+        aplican) y una columna `kind` para separarlas; devuelve (contenido, galería)
+        como dicts con las columnas de cada tabla, ordenados por order_index.
+        """
+        content = HomepageContent.__table__.c
+        gallery = HomepageGallery.__table__.c
+        
+        content_select = select(
+            literal('c').label('kind'),
+            content.id, content.section, content.title, content.subtitle,
+            content.description, content.image_url, content.button_text, content.button_url,
+            cast(null(), String).label('category'),
+            content.order_index,
+            cast(null(), Boolean).label('is_featured'),
+            content.is_active, content.extra_data, content.created_at, content.updated_at
+        ).where(content.is_active == True)
+        
+        gallery_select = select(
+            literal('g').label('kind'),
+            gallery.id,
+            cast(null(), String).label('section'),
+            gallery.title,
+            cast(null(), String).label('subtitle'),
+            gallery.description, gallery.image_url,
+            cast(null(), String).label('button_text'),
+            cast(null(), String).label('button_url'),
+            gallery.category, gallery.order_index, gallery.is_featured, gallery.is_active,
+            cast(null(), Text).label('extra_data'),
+            gallery.created_at, gallery.updated_at
+        ).where(gallery.is_active == True, gallery.is_featured == True)
+        
+        stmt = union_all(content_select, gallery_select)
+        stmt = stmt.order_by(stmt.selected_columns.kind, stmt.selected_columns.order_index)
+        
+        content_keys = HomepageContent.__table__.c.keys()
+        gallery_keys = HomepageGallery.__table__.c.keys()
+        content_rows: List[dict] = []
+        gallery_rows: List[dict] = []
+        for row in db.execute(stmt).mappings():
+            if row['kind'] == 'c':
+                content_rows.append({key: row[key] for key in content_keys})
+            else:
+                gallery_rows.append({key: row[key] for key in gallery_keys})
+        return content_rows, gallery_rows
+    
     # ===== HOMEPAGE GALLERY =====
     
     def get_all_gallery(self, db: Session, featured_only: bool = False) -> List[HomepageGallery]:
@@ -66,6 +158,26 @@ class HomepageService:
         
         return query.order_by(HomepageGallery.order_index).all()
     
+    def get_all_gallery_core(
+        self,
+        db: Session,
+        featured_only: bool = False,
+        include_inactive: bool = False
+    ) -> List[RowMapping]:
+        """Igual que get_all_gallery pero con Core: devuelve mappings sin hidratar objetos ORM
+        
+        Con include_inactive=True devuelve todo (sin orden), como el listado de admin.
+        """
+        table = HomepageGallery.__table__
+        stmt = select(table)
+        if include_inactive:
+            return db.execute(stmt).mappings().all()
+        
+        stmt = stmt.where(table.c.is_active == True)
+        if featured_only:
+            stmt = stmt.where(table.c.is_featured == True)
+        return db.execute(stmt.order_by(table.c.order_index)).mappings().all()
+    
     def get_gallery_by_category(self, db: Session, category: str) -> List[HomepageGallery]:
         """Obtener galería por categoría"""
         return db.query(HomepageGallery).filter(
@@ -73,36 +185,58 @@ class HomepageService:
             HomepageGallery.is_active == True
         ).order_by(HomepageGallery.order_index).all()
     
+    def get_gallery_by_category_core(self, db: Session, category: str) -> List[RowMapping]:
+        """Igual que get_gallery_by_category pero con Core (mappings sin hidratar objetos ORM)"""
+        table = HomepageGallery.__table__
+        stmt = select(table).where(
+            table.c.category == category,
+            table.c.is_active == True
+        ).order_by(table.c.order_index)
+        return db.execute(stmt).mappings().all()
+    
     def create_gallery_item(self, db: Session, gallery: HomepageGalleryCreate) -> HomepageGallery:
         """Crear nuevo item de galería"""
         db_gallery = HomepageGallery(**gallery.dict())
         db.add(db_gallery)
         db.commit()
+        self._bump_version()
         db.refresh(db_gallery)
         return db_gallery
     
-    def update_gallery_item(self, db: Session, gallery_id: int, gallery: HomepageGalleryUpdate) -> Optional[HomepageGallery]:
-        """Actualizar item de galería"""
-        db_gallery = db.query(HomepageGallery).filter(HomepageGallery.id == gallery_id).first()
-        if not db_gallery:
-            return None
+    def update_gallery_item(self, db: Session, gallery_id: int, gallery: HomepageGalleryUpdate) -> Optional[RowMapping]:
+        """Actualizar item de galería
         
+        Un único UPDATE ... RETURNING (sin cargar ni refrescar el objeto ORM);
+        devuelve la fila actualizada como mapping o None si no existe.
+        """
+        table = HomepageGallery.__table__
         update_data = gallery.dict(exclude_unset=True)
-        for key, value in update_data.items():
-            setattr(db_gallery, key, value)
+        if not update_data:
+            return db.execute(select(table).where(table.c.id == gallery_id)).mappings().first()
+        
+        row = db.execute(
+            update(table).where(table.c.id == gallery_id).values(**update_data).returning(*table.c)
+        ).mappings().first()
+        if row is None:
+            return None
         
         db.commit()
-        db.refresh(db_gallery)
-        return db_gallery
+        self._bump_version()
+        return row
     
     def delete_gallery_item(self, db: Session, gallery_id: int) -> bool:
-        """Eliminar item de galería (soft delete)"""
-        db_gallery = db.query(HomepageGallery).filter(HomepageGallery.id == gallery_id).first()
-        if not db_gallery:
+        """Eliminar item de galería (soft delete) con un único UPDATE ... RETURNING"""
+        deleted_id = db.execute(
+            update(HomepageGallery)
+            .where(HomepageGallery.id == gallery_id)
+            .values(is_active=False)
+            .returning(HomepageGallery.id)
+        ).scalar_one_or_none()
+        if deleted_id is None:
             return False
         
-        db_gallery.is_active = False
         db.commit()
+        self._bump_version()
         return True
 
 # Instancia del servicio
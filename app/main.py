@@ -3,14 +3,14 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.staticfiles import StaticFiles
 from starlette.middleware.sessions import SessionMiddleware
-from fastapi.responses import RedirectResponse
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from fastapi.responses import RedirectResponse, Response
 from starlette.types import ASGIApp, Receive, Scope, Send
 from starlette.requests import Request
 import asyncio
-import logging
+import json
 import os
-from urllib.parse import urlparse, urlunparse
+import re
 
 from app.core.config import settings, FRONTEND_ORIGINS
 from app.auth.routes import router as auth_router
@@ -20,22 +20,27 @@ from app.storage.routes import router as storage_router
 from app.courses.routes import router as courses_router
 from app.blog.routes import router as blog_router
 from app.homepage.routes import router as homepage_router
+from app.db.migrate import MIGRATION_STATUS, run_db_migrations
+from app.storage.r2 import r2_service
 
-# Middleware para forzar HTTPS en producción
-class ForceHTTPSMiddleware(BaseHTTPMiddleware):
+# Middleware para forzar HTTPS en producción. ASGI puro (no BaseHTTPMiddleware):
+# así la respuesta sigue llegando a GZip con Content-Length y respeta minimum_size
+class ForceHTTPSMiddleware:
     def __init__(self, app: ASGIApp):
-        super().__init__(app)
+        self.app = app
 
-    async def dispatch(self, request: Request, call_next):
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
         # Solo aplicar en entorno de producción (Railway lo setea)
-        if os.getenv("RAILWAY_ENVIRONMENT") == "production":
+        if scope["type"] == "http" and os.getenv("RAILWAY_ENVIRONMENT") == "production":
+            request = Request(scope)
             # Si la cabecera x-forwarded-proto no es https, redirigir
             if request.headers.get("x-forwarded-proto") != "https" and not request.url.path.startswith("/health"):
                 url = request.url.replace(scheme="https")
-                return RedirectResponse(url=url, status_code=308)
-        
-        response = await call_next(request)
-        return response
+                response = RedirectResponse(url=url, status_code=308)
+                await response(scope, receive, send)
+                return
+
+        await self.app(scope, receive, send)
 
 app = FastAPI(
     title="TecnoJuy API",
@@ -43,28 +48,38 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# HTTPS Redirect Middleware (debe ser el primero)
+# Middlewares: Starlette los ejecuta en orden inverso al de registro (el último
+# agregado es el más externo). CORS va último para responder los preflight antes
+# de tocar la sesión o el host.
+
+# HTTPS Redirect Middleware (el más interno, justo antes de la app)
 app.add_middleware(ForceHTTPSMiddleware)
 
+# Trusted hosts
+app.add_middleware(
+    TrustedHostMiddleware,
+    allowed_hosts=["*"]  # En producción, especificar dominios exactos
+)
+
 # Session middleware (necesario para OAuth)
 app.add_middleware(
     SessionMiddleware,
     secret_key=settings.SECRET_KEY
 )
 
-# CORS
+# Compresión de respuestas (JSON de posts/cursos comprime 5-10x); las de menos de
+# 500 bytes (/, /health) salen sin comprimir. Dentro de CORS: los preflight se
+# responden antes y sin comprimir
+app.add_middleware(GZipMiddleware, minimum_size=500, compresslevel=5)
+
+# CORS (el más externo)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=FRONTEND_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-)
-
-# Trusted hosts
-app.add_middleware(
-    TrustedHostMiddleware,
-    allowed_hosts=["*"]  # En producción, especificar dominios exactos
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Routers
@@ -82,40 +97,12 @@ if os.path.exists(static_dir):
     app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
 
+# user:password@ -> user:***@ (el usuario se deja visible para diagnosticar)
+_DB_URL_PASSWORD = re.compile(r"(://[^:/@]+):[^@]*@")
+
+
 def _mask_db_url(url: str) -> str:
-    try:
-        u = urlparse(url)
-        netloc = u.netloc
-        if "@" in netloc:
-            creds, host = netloc.split("@", 1)
-            user = creds.split(":", 1)[0] if ":" in creds else creds
-            netloc = f"{user}:***@{host}"
-        return urlunparse(u._replace(netloc=netloc))
-    except Exception:
-        return "unknown"
-
-
-def _run_db_migrations() -> None:
-    """Run Alembic migrations to head using Alembic API.
-    This runs in a background thread so startup/healthcheck aren't blocked.
-    """
-    try:
-        from alembic import command
-        from alembic.config import Config
-        # Resolve path to alembic.ini at project root (one level up from app/)
-        project_root = os.path.dirname(os.path.dirname(__file__))
-        alembic_ini = os.path.join(project_root, "alembic.ini")
-
-        cfg = Config(alembic_ini)
-        # Ensure the runtime DB URL is used (Railway env)
-        if getattr(settings, "DATABASE_URL", None):
-            cfg.set_main_option("sqlalchemy.url", settings.DATABASE_URL)
-
-        logging.getLogger("uvicorn.error").info("[migrations] Running alembic upgrade head")
-        command.upgrade(cfg, "head")
-        logging.getLogger("uvicorn.error").info("[migrations] Alembic upgrade completed")
-    except Exception as e:
-        logging.getLogger("uvicorn.error").error(f"[migrations] Alembic upgrade failed: {e}")
+    return _DB_URL_PASSWORD.sub(r"\1:***@", url)
 
 
 @app.on_event("startup")
@@ -123,14 +110,37 @@ async def on_startup():
     # Log minimal info to verify DB URL source without leaking secrets
     masked = _mask_db_url(settings.DATABASE_URL or "")
     print(f"[startup] Using DATABASE_URL: {masked}")
-    # Fire-and-forget DB migrations to keep startup fast
-    asyncio.create_task(asyncio.to_thread(_run_db_migrations))
+    # Las migraciones las corre el pre-deploy (scripts/migrate.py); en local se
+    # pueden correr al arrancar con MIGRATION_MODE=sync|async
+    mode = (settings.MIGRATION_MODE or "skip").strip().lower()
+    MIGRATION_STATUS["mode"] = mode
+    if mode == "sync":
+        await asyncio.to_thread(run_db_migrations)
+    elif mode == "async":
+        # Fire-and-forget para no bloquear el arranque ni el healthcheck
+        asyncio.create_task(asyncio.to_thread(run_db_migrations))
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    # Cerrar el pool de conexiones del cliente async de R2
+    await r2_service.aclose()
+
+# Cuerpos constantes serializados una sola vez: los probes de Railway pegan
+# a /health cada pocos segundos
+_ROOT_BODY = json.dumps({"message": "TecnoJuy API - Sistema educativo"}).encode()
+_health_body_cache: tuple = (None, b"")
 
 @app.get("/")
 async def root():
-    return {"message": "TecnoJuy API - Sistema educativo"}
+    return Response(content=_ROOT_BODY, media_type="application/json")
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy"}
+    # Solo cambia con el estado de las migraciones: se re-serializa cuando cambia
+    global _health_body_cache
+    key = tuple(MIGRATION_STATUS.items())
+    if _health_body_cache[0] != key:
+        body = json.dumps({"status": "healthy", "migrations": MIGRATION_STATUS}).encode()
+        _health_body_cache = (key, body)
+    return Response(content=_health_body_cache[1], media_type="application/json")
 
@@ -1,24 +1,79 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+import hashlib
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
 from app.db.session import get_db
+from app.core.pagination import encode_cursor, decode_cursor
+from app.core.http import etag_matches
 from app.auth.dependencies import get_current_user, require_admin
-from app.posts.schemas import PostResponse, PostCreate, PostUpdate, PostSummary, AuthorInfo
-from app.posts.service import PostService
+from app.posts.schemas import PostResponse, PostCreate, PostUpdate, PostSummary
+from app.posts.service import PostService, POST_CACHE_TTL_SECONDS
 from app.db.models import User, Post
 
 router = APIRouter()
 
+# Handlers síncronos (def): FastAPI los ejecuta en su threadpool, así las consultas
+# bloqueantes de la Session no frenan el event loop
+
+# Listados: se serializan directo con el TypeAdapter (JSON en Rust), sin la
+# validación de response_model; response_model queda como documentación
+_summary_list_adapter = TypeAdapter(List[PostSummary])
+
+def _summaries_response(posts: List[Post], headers: Optional[dict] = None) -> Response:
+    summaries = [
+        PostSummary.model_construct(
+            id=post.id,
+            title=post.title,
+            author_name=post.author.name,
+            created_at=post.created_at,
+            is_published=post.is_published,
+        )
+        for post in posts
+    ]
+    return Response(
+        content=_summary_list_adapter.dump_json(summaries),
+        media_type="application/json",
+        headers=headers
+    )
+
+def _modified_at(post) -> Optional[datetime]:
+    # updated_at solo se setea al editar: un post nunca editado usa created_at
+    # (las columnas son nullable: puede no haber ninguno de los dos)
+    return post.updated_at or post.created_at
+
+def _modified_ts(post) -> float:
+    modified = _modified_at(post)
+    return modified.timestamp() if modified else 0.0
+
+def _post_etag(post) -> str:
+    """ETag débil de un post: id + última modificación"""
+    return f'W/"{post.id}-{int(_modified_ts(post))}"'
+
+def _posts_page_etag(posts: Iterable) -> str:
+    """ETag débil de una página: cambia si cambia la composición o algún post"""
+    page = "|".join(f"{post.id}:{_modified_ts(post)}" for post in posts)
+    return f'W/"{hashlib.md5(page.encode()).hexdigest()}"'
+
 @router.get("/", response_model=List[PostSummary])
-async def get_posts(
+def get_posts(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
     author_id: Optional[int] = Query(None),
     search: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None),
     db: Session = Depends(get_db)
 ):
-    """Obtener lista pública de posts"""
+    """Obtener lista pública de posts
+    
+    El listado normal pagina por cursor: si la página está completa, el header
+    X-Next-Cursor trae el valor para pedir la siguiente (?cursor=...). skip se
+    mantiene para clientes existentes y para la búsqueda (ordenada por relevancia).
+    """
     
     if search:
         # Búsqueda por término
@@ -36,30 +91,33 @@ async def get_posts(
             skip=skip,
             limit=limit,
             author_id=author_id,
-            include_unpublished=False
+            include_unpublished=False,
+            cursor=decode_cursor(cursor) if cursor else None
         )
+        next_cursor = encode_cursor(posts[-1]) if len(posts) == limit else None
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+    
+    # Página sin cambios para este cliente: 304 sin serializar ni transferir el cuerpo
+    etag = _posts_page_etag(posts)
+    if etag_matches(request, etag):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED,
+            headers={"ETag": etag, **response.headers}
+        )
+    response.headers["ETag"] = etag
     
-    # Convertir a PostSummary
-    result = []
-    for post in posts:
-        result.append(PostSummary(
-            id=post.id,
-            title=post.title,
-            cover_image_url=getattr(post, 'cover_image_url', None),
-            author_name=post.author.name,
-            created_at=post.created_at,
-            is_published=post.is_published
-        ))
-    
-    return result
+    return _summaries_response(posts, headers=dict(response.headers))
 
 @router.get("/{post_id}", response_model=PostResponse)
-async def get_post_by_id(
+def get_post_by_id(
     post_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db)
 ):
-    """Obtener post por ID (público)"""
-    post = PostService.get_post_by_id(db, post_id, include_unpublished=False)
+    """Obtener post por ID (público, cacheado en memoria y en CDN/proxies)"""
+    post = PostService.get_public_post(db, post_id)
     
     if not post:
         raise HTTPException(
@@ -67,24 +125,20 @@ async def get_post_by_id(
             detail="Post not found"
         )
     
-    return PostResponse(
-        id=post.id,
-        title=post.title,
-        content=post.content,
-        cover_image_url=post.cover_image_url,
-        is_published=post.is_published,
-        author=AuthorInfo(
-            id=post.author.id,
-            name=post.author.name,
-            email=post.author.email,
-            avatar_url=post.author.avatar_url
-        ),
-        created_at=post.created_at,
-        updated_at=post.updated_at
-    )
+    cache_headers = {
+        "Cache-Control": f"public, max-age={POST_CACHE_TTL_SECONDS}",
+        "ETag": _post_etag(post),
+    }
+    modified = _modified_at(post)
+    if modified:
+        cache_headers["Last-Modified"] = modified.astimezone(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S GMT")
+    if etag_matches(request, cache_headers["ETag"]):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers)
+    response.headers.update(cache_headers)
+    return post
 
 @router.post("/", response_model=PostResponse)
-async def create_post(
+def create_post(
     post_data: PostCreate,
     current_user: User = Depends(require_admin),
     db: Session = Depends(get_db)
@@ -97,27 +151,11 @@ async def create_post(
         author_id=current_user.id
     )
     
-    # Recargar post con información del autor
-    post_with_author = PostService.get_post_by_id(db, post.id, include_unpublished=True)
-    
-    return PostResponse(
-        id=post_with_author.id,
-        title=post_with_author.title,
-        content=post_with_author.content,
-        cover_image_url=post_with_author.cover_image_url,
-        is_published=post_with_author.is_published,
-        author=AuthorInfo(
-            id=post_with_author.author.id,
-            name=post_with_author.author.name,
-            email=post_with_author.author.email,
-            avatar_url=post_with_author.author.avatar_url
-        ),
-        created_at=post_with_author.created_at,
-        updated_at=post_with_author.updated_at
-    )
+    # El refresh del service ya trajo el autor (relación selectin): sin segunda consulta
+    return PostResponse.model_validate(post)
 
 @router.put("/{post_id}", response_model=PostResponse)
-async def update_post(
+def update_post(
     post_id: int,
     post_data: PostUpdate,
     current_user: User = Depends(require_admin),
@@ -137,27 +175,11 @@ async def update_post(
             detail="Post not found"
         )
     
-    # Recargar post con información del autor
-    post_with_author = PostService.get_post_by_id(db, updated_post.id, include_unpublished=True)
-    
-    return PostResponse(
-        id=post_with_author.id,
-        title=post_with_author.title,
-        content=post_with_author.content,
-        cover_image_url=post_with_author.cover_image_url,
-        is_published=post_with_author.is_published,
-        author=AuthorInfo(
-            id=post_with_author.author.id,
-            name=post_with_author.author.name,
-            email=post_with_author.author.email,
-            avatar_url=post_with_author.author.avatar_url
-        ),
-        created_at=post_with_author.created_at,
-        updated_at=post_with_author.updated_at
-    )
+    # El refresh del service ya trajo el autor (relación selectin): sin segunda consulta
+    return PostResponse.model_validate(updated_post)
 
 @router.delete("/{post_id}")
-async def delete_post(
+def delete_post(
     post_id: int,
     current_user: User = Depends(require_admin),
     db: Session = Depends(get_db)
@@ -175,7 +197,7 @@ async def delete_post(
     return {"message": "Post deleted successfully"}
 
 @router.get("/admin/all/", response_model=List[PostSummary])
-async def get_all_posts_admin(
+def get_all_posts_admin(
     skip: int = Query(0, ge=0),
     limit: int = Query(20, ge=1, le=100),
     is_published: Optional[bool] = Query(None),
@@ -192,22 +214,10 @@ async def get_all_posts_admin(
         include_unpublished=True
     )
     
-    # Convertir a PostSummary
-    result = []
-    for post in posts:
-        result.append(PostSummary(
-            id=post.id,
-            title=post.title,
-            cover_image_url=getattr(post, 'cover_image_url', None),
-            author_name=post.author.name,
-            created_at=post.created_at,
-            is_published=post.is_published
-        ))
-    
-    return result
+    return _summaries_response(posts)
 
 @router.get("/admin/{post_id}/", response_model=PostResponse)
-async def get_post_admin(
+def get_post_admin(
     post_id: int,
     current_user: User = Depends(require_admin),
     db: Session = Depends(get_db)
@@ -222,20 +232,6 @@ async def get_post_admin(
             detail="Post not found"
         )
     
-    return PostResponse(
-        id=post.id,
-        title=post.title,
-        content=post.content,
-        cover_image_url=post.cover_image_url,
-        is_published=post.is_published,
-        author=AuthorInfo(
-            id=post.author.id,
-            name=post.author.name,
-            email=post.author.email,
-            avatar_url=post.author.avatar_url
-        ),
-        created_at=post.created_at,
-        updated_at=post.updated_at
-    )
+    return PostResponse.model_validate(post)
 
 
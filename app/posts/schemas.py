@@ -1,5 +1,5 @@
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import AliasChoices, AliasPath, BaseModel, Field
 from typing import Optional
 
 class PostBase(BaseModel):
@@ -22,6 +22,9 @@ class AuthorInfo(BaseModel):
     name: str
     email: str
     avatar_url: Optional[str] = None
+    
+    class Config:
+        from_attributes = True
 
 class PostResponse(PostBase):
     id: int
@@ -37,7 +40,8 @@ class PostSummary(BaseModel):
     id: int
     title: str
     cover_image_url: Optional[str] = None
-    author_name: str
+    # Desde el ORM se lee de post.author.name (autor precargado en los listados)
+    author_name: str = Field(validation_alias=AliasChoices('author_name', AliasPath('author', 'name')))
     created_at: datetime
     is_published: bool
     
@@ -1,21 +1,80 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy.orm import Session, joinedload, lazyload, load_only, selectinload
+from sqlalchemy import desc, and_, func, literal_column, tuple_
 
-from app.db.models import Post, User
-from app.posts.schemas import PostCreate, PostUpdate
+from app.db.models import Post
+from app.posts.schemas import PostCreate, PostUpdate, PostResponse
+
+# Debe coincidir con la expresión de ix_posts_fts para que Postgres use el índice GIN.
+# La configuración va como literal (no como parámetro) por la misma razón.
+_SEARCH_CONFIG = literal_column("'spanish'::regconfig")
+_post_search_vector = func.to_tsvector(_SEARCH_CONFIG, Post.title + literal_column("' '") + Post.content)
+
+# Filtro de posts públicos. Se escribe igual que el predicado de ix_posts_listing
+# (is_published = true, literal y no parámetro) para que el planner pueda usar el
+# índice parcial; los listados de admin sin filtro recorren la tabla completa.
+_published = Post.is_published == True
+
+def _filter_visibility(query, is_published: Optional[bool], include_unpublished: bool):
+    """Aplicar el filtro de publicación de los listados"""
+    if is_published or (is_published is None and not include_unpublished):
+        return query.filter(_published)
+    if is_published is False:
+        return query.filter(Post.is_published == False)
+    return query
+
+# Cache LRU en memoria del detalle público: {post_id: (expira_en, PostResponse)}.
+# Guarda la respuesta ya construida (no la instancia de SQLAlchemy, atada a la sesión)
+POST_CACHE_TTL_SECONDS = 60
+POST_CACHE_MAXSIZE = 1024
+_post_cache: "OrderedDict[int, Tuple[float, PostResponse]]" = OrderedDict()
+_post_cache_lock = threading.Lock()
+
+def _invalidate_post_cache(post_id: int) -> None:
+    with _post_cache_lock:
+        _post_cache.pop(post_id, None)
 
 class PostService:
     @staticmethod
     def get_post_by_id(db: Session, post_id: int, include_unpublished: bool = False) -> Optional[Post]:
-        """Obtener post por ID"""
-        query = db.query(Post).join(User).filter(Post.id == post_id)
+        """Obtener post por ID (con autor en el mismo SELECT)"""
+        query = db.query(Post).options(joinedload(Post.author)).filter(Post.id == post_id)
         
         if not include_unpublished:
-            query = query.filter(Post.is_published == True)
+            query = query.filter(_published)
         
         return query.first()
     
+    @staticmethod
+    def get_public_post(db: Session, post_id: int) -> Optional[PostResponse]:
+        """Obtener el detalle público de un post, cacheado en memoria por POST_CACHE_TTL_SECONDS
+        
+        Las ediciones y borrados en este proceso invalidan la entrada; en otros
+        workers el TTL corto acota cuánto puede durar una versión vieja.
+        """
+        now = time.monotonic()
+        with _post_cache_lock:
+            cached = _post_cache.get(post_id)
+            if cached and now < cached[0]:
+                _post_cache.move_to_end(post_id)
+                return cached[1]
+        
+        post = PostService.get_post_by_id(db, post_id, include_unpublished=False)
+        if not post:
+            return None
+        response = PostResponse.model_validate(post)
+        
+        with _post_cache_lock:
+            _post_cache[post_id] = (now + POST_CACHE_TTL_SECONDS, response)
+            _post_cache.move_to_end(post_id)
+            while len(_post_cache) > POST_CACHE_MAXSIZE:
+                _post_cache.popitem(last=False)
+        return response
+    
     @staticmethod
     def get_posts(
         db: Session,
@@ -23,26 +82,43 @@ class PostService:
         limit: int = 100,
         author_id: Optional[int] = None,
         is_published: Optional[bool] = None,
-        include_unpublished: bool = False
+        include_unpublished: bool = False,
+        cursor: Optional[Tuple[datetime, int]] = None
     ) -> List[Post]:
-        """Obtener lista de posts con filtros"""
-        query = db.query(Post).join(User)
+        """Obtener lista de posts con filtros
+        
+        Con cursor (created_at, id) del último post de la página anterior se
+        pagina por keyset en lugar de OFFSET: cada página es un range scan sobre
+        ix_posts_listing sin descartar filas. Los autores de la página se
+        cargan en un solo SELECT ... IN adicional.
+        
+        Solo carga las columnas del listado (PostSummary + updated_at para el
+        ETag), que son las que cubre ix_posts_listing: sin content ni visitas al heap.
+        """
+        query = db.query(Post).options(
+            load_only(Post.id, Post.title, Post.author_id, Post.created_at, Post.updated_at, Post.is_published),
+            selectinload(Post.author),
+            lazyload(Post.category),
+            lazyload(Post.tags),
+        )
         
         # Filtro por autor
         if author_id:
             query = query.filter(Post.author_id == author_id)
         
-        # Filtro por estado de publicación
-        if is_published is not None:
-            query = query.filter(Post.is_published == is_published)
-        elif not include_unpublished:
-            # Por defecto, solo mostrar posts publicados
-            query = query.filter(Post.is_published == True)
+        # Filtro por estado de publicación (por defecto, solo publicados)
+        query = _filter_visibility(query, is_published, include_unpublished)
         
-        # Ordenar por fecha de creación (más reciente primero)
-        query = query.order_by(desc(Post.created_at))
+        # Continuar después del último post visto
+        if cursor is not None:
+            query = query.filter(tuple_(Post.created_at, Post.id) < tuple_(*cursor))
         
-        return query.offset(skip).limit(limit).all()
+        # Ordenar por fecha de creación (más reciente primero); id desempata
+        query = query.order_by(desc(Post.created_at), desc(Post.id))
+        
+        if cursor is None and skip:
+            query = query.offset(skip)
+        return query.limit(limit).all()
     
     @staticmethod
     def create_post(db: Session, post_data: PostCreate, author_id: int) -> Post:
@@ -79,6 +155,7 @@ class PostService:
             setattr(post, field, value)
         
         db.commit()
+        _invalidate_post_cache(post_id)
         db.refresh(post)
         return post
     
@@ -97,6 +174,7 @@ class PostService:
         
         db.delete(post)
         db.commit()
+        _invalidate_post_cache(post_id)
         return True
     
     @staticmethod
@@ -112,10 +190,7 @@ class PostService:
         if author_id:
             query = query.filter(Post.author_id == author_id)
         
-        if is_published is not None:
-            query = query.filter(Post.is_published == is_published)
-        elif not include_unpublished:
-            query = query.filter(Post.is_published == True)
+        query = _filter_visibility(query, is_published, include_unpublished)
         
         return query.count()
     
@@ -128,18 +203,19 @@ class PostService:
         include_unpublished: bool = False
     ) -> List[Post]:
         """Buscar posts por término"""
-        query = db.query(Post).join(User)
+        query = db.query(Post).options(selectinload(Post.author))
         
         if not include_unpublished:
-            query = query.filter(Post.is_published == True)
+            query = query.filter(_published)
         
-        # Buscar en título y contenido
-        search_filter = Post.title.contains(search_term) | Post.content.contains(search_term)
-        query = query.filter(search_filter)
+        # Full-text en título y contenido sobre el índice GIN; websearch_to_tsquery
+        # acepta la sintaxis libre del buscador ("frase", -excluir, OR) sin errores
+        search_query = func.websearch_to_tsquery(_SEARCH_CONFIG, search_term)
+        query = query.filter(_post_search_vector.op('@@')(search_query))
         
-        # Ordenar por relevancia (título primero) y fecha
+        # Ordenar por relevancia y fecha
         query = query.order_by(
-            Post.title.contains(search_term).desc(),
+            func.ts_rank(_post_search_vector, search_query).desc(),
             desc(Post.created_at)
         )
         
@@ -1,22 +1,153 @@
-import boto3
+# boto3 se importa al crear el cliente (R2Service.__init__): son ~150 ms de
+# arranque que sin R2 configurado no hace falta pagar. botocore.exceptions es liviano.
 from botocore.exceptions import ClientError
-from typing import Optional
-import uuid
-from datetime import datetime
+from typing import BinaryIO, List, Optional, Union
+import asyncio
+import importlib.util
+import os
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote, urlsplit
+import hashlib
+import hmac
 import logging
 
 from app.core.config import settings
 
+# aioboto3 es opcional (sin él las subidas usan boto3 en un thread) y también se
+# importa recién al crear el cliente async
+_AIOBOTO3_AVAILABLE = importlib.util.find_spec("aioboto3") is not None
+
 # Configurar logger
 logger = logging.getLogger(__name__)
 
 
+def time_ordered_id() -> str:
+    """ID único ordenado por tiempo: UUIDv7 (RFC 9562) en hex.
+
+    48 bits de timestamp en ms + 74 bits aleatorios. Las keys generadas con este
+    ID quedan ordenadas lexicográficamente por fecha de creación dentro de cada
+    prefijo del bucket.
+    """
+    ms = time.time_ns() // 1_000_000
+    rand = int.from_bytes(os.urandom(10), "big")
+    value = (
+        (ms & 0xFFFF_FFFF_FFFF) << 80
+        | 0x7 << 76                          # versión 7
+        | (rand >> 68) << 64                 # rand_a (12 bits)
+        | 0b10 << 62                         # variante RFC
+        | rand & 0x3FFF_FFFF_FFFF_FFFF       # rand_b (62 bits)
+    )
+    return f"{value:032x}"
+
+
+class SigV4Presigner:
+    """Firma URLs GET/PUT (SigV4 en query string) sin pasar por la maquinaria de botocore.
+
+    Produce URLs equivalentes a client.generate_presigned_url('get_object' | 'put_object', ...)
+    con path-style addressing, que es lo que usa boto3 con un endpoint_url propio como R2.
+    Firma el header host y, si se indica content_type, también Content-Type (igual
+    que botocore cuando se pasa ContentType en Params).
+    La signing key depende solo de la fecha, así que se deriva una vez por día.
+    """
+
+    ALGORITHM = "AWS4-HMAC-SHA256"
+
+    def __init__(self, endpoint_url: str, access_key: str, secret_key: str, region: str = "auto"):
+        parts = urlsplit(endpoint_url)
+        self._base_url = f"{parts.scheme}://{parts.netloc}"
+        self._base_path = parts.path.rstrip("/")
+        self._host = parts.netloc
+        self._access_key = access_key
+        self._secret_key = secret_key
+        self._region = region
+        self._signing_key_cache: tuple[str, bytes] | None = None
+
+    def _signing_key(self, datestamp: str) -> bytes:
+        cached = self._signing_key_cache
+        if cached and cached[0] == datestamp:
+            return cached[1]
+        key = f"AWS4{self._secret_key}".encode()
+        for part in (datestamp, self._region, "s3", "aws4_request"):
+            key = hmac.new(key, part.encode(), hashlib.sha256).digest()
+        self._signing_key_cache = (datestamp, key)
+        return key
+
+    def presign(
+        self,
+        bucket: str,
+        object_key: str,
+        expiration: int,
+        now: Optional[datetime] = None,
+        method: str = "GET",
+        content_type: Optional[str] = None
+    ) -> str:
+        now = now or datetime.now(timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        datestamp = amz_date[:8]
+        scope = f"{datestamp}/{self._region}/s3/aws4_request"
+
+        canonical_uri = f"{self._base_path}/{bucket}/{quote(object_key, safe='/~')}"
+        if content_type:
+            signed_headers = "content-type;host"
+            canonical_headers = f"content-type:{content_type.strip()}\nhost:{self._host}\n"
+        else:
+            signed_headers = "host"
+            canonical_headers = f"host:{self._host}\n"
+        canonical_query = "&".join(
+            f"{name}={quote(value, safe='-_.~')}"
+            for name, value in (
+                ("X-Amz-Algorithm", self.ALGORITHM),
+                ("X-Amz-Credential", f"{self._access_key}/{scope}"),
+                ("X-Amz-Date", amz_date),
+                ("X-Amz-Expires", str(expiration)),
+                ("X-Amz-SignedHeaders", signed_headers),
+            )
+        )
+        canonical_request = (
+            f"{method}\n{canonical_uri}\n{canonical_query}\n"
+            f"{canonical_headers}\n{signed_headers}\nUNSIGNED-PAYLOAD"
+        )
+        string_to_sign = (
+            f"{self.ALGORITHM}\n{amz_date}\n{scope}\n"
+            f"{hashlib.sha256(canonical_request.encode()).hexdigest()}"
+        )
+        signature = hmac.new(self._signing_key(datestamp), string_to_sign.encode(), hashlib.sha256).hexdigest()
+        return f"{self._base_url}{canonical_uri}?{canonical_query}&X-Amz-Signature={signature}"
+
+
+# Subidas multipart (upload_fileobj): tamaño de parte y partes en vuelo por archivo
+UPLOAD_PART_SIZE = 8 * 1024 * 1024
+UPLOAD_MAX_CONCURRENCY = 8
+
+
+# Contenido de una subida: un buffer en memoria (bytearray/memoryview se suben tal
+# cual, sin copiarlos a bytes) o un archivo abierto, que se sube en streaming
+UploadContent = Union[bytes, bytearray, memoryview, BinaryIO]
+_BUFFER_TYPES = (bytes, bytearray, memoryview)
+
+
+class R2UploadError(Exception):
+    """Fallo de upload_fileobj (S3UploadFailedError de boto3, importado en diferido)"""
+
+
 class R2Service:
     def __init__(self):
         # Leer config desde variables de entorno
         endpoint_url = (settings.R2_ENDPOINT_URL or "").strip()
         access_key = (settings.R2_ACCESS_KEY_ID or "").strip()
         secret_key = (settings.R2_SECRET_ACCESS_KEY or "").strip()
+        self._client_kwargs = dict(
+            endpoint_url=endpoint_url,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            region_name='auto'
+        )
+
+        # Cliente async (aioboto3), creado al primer uso y compartido por el proceso
+        self._aio_client = None
+        self._aio_client_cm = None
+        self._aio_client_lock: asyncio.Lock | None = None
 
         # Buckets/URLs (pueden estar vacíos en entornos sin R2)
         self.bucket_name = (settings.R2_BUCKET_NAME or "").strip()
@@ -27,29 +158,133 @@ class R2Service:
         # Solo crea el cliente si hay endpoint y credenciales; si no, deja deshabilitado
         if endpoint_url and access_key and secret_key:
             try:
+                import boto3
+                from boto3.s3.transfer import TransferConfig
+                from botocore.config import Config
+
+                # Un solo cliente (thread-safe) para todo el proceso: pool de conexiones
+                # amplio para subidas concurrentes, keep-alive y reintentos "standard"
                 self.client = boto3.client(
                     's3',
-                    endpoint_url=endpoint_url,
-                    aws_access_key_id=access_key,
-                    aws_secret_access_key=secret_key,
-                    region_name='auto'
+                    config=Config(
+                        max_pool_connections=settings.R2_MAX_POOL_CONNECTIONS,
+                        tcp_keepalive=True,
+                        retries={"max_attempts": 3, "mode": "standard"},
+                    ),
+                    **self._client_kwargs
                 )
+                # Subidas de archivos: multipart en partes de 8 MiB, 8 partes en paralelo
+                # (cada una por su propia conexión del pool; nunca más que el pool)
+                self.transfer_config = TransferConfig(
+                    multipart_threshold=UPLOAD_PART_SIZE,
+                    multipart_chunksize=UPLOAD_PART_SIZE,
+                    max_concurrency=min(UPLOAD_MAX_CONCURRENCY, settings.R2_MAX_POOL_CONNECTIONS),
+                    use_threads=True,
+                )
+                self.presigner = SigV4Presigner(endpoint_url, access_key, secret_key)
                 self.enabled = True
                 logger.info("R2 client initialized for endpoint %s", endpoint_url)
             except Exception:
                 # No bloquea el arranque si falla aquí
                 self.client = None
+                self.presigner = None
+                self.transfer_config = None
                 self.enabled = False
                 logger.exception("Failed to initialize R2 client; R2 features disabled")
         else:
             self.client = None
+            self.presigner = None
+            self.transfer_config = None
             self.enabled = False
             logger.warning("R2 not configured (missing endpoint and/or credentials); storage features disabled")
 
     def _require_client(self) -> None:
         if not self.client:
             raise Exception("R2 is not configured. Set R2_ENDPOINT_URL, R2_ACCESS_KEY_ID, R2_SECRET_ACCESS_KEY, and bucket variables.")
+
+    async def _get_async_client(self):
+        """Cliente S3 de aioboto3 compartido (un pool de conexiones para todas las subidas).
+
+        Devuelve None si aioboto3 no está instalado o R2 no está configurado:
+        el caller sigue con boto3 en un thread.
+        """
+        if not _AIOBOTO3_AVAILABLE or not self.enabled:
+            return None
+        if self._aio_client is not None:
+            return self._aio_client
+        if self._aio_client_lock is None:
+            self._aio_client_lock = asyncio.Lock()
+        async with self._aio_client_lock:
+            if self._aio_client is None:
+                try:
+                    import aioboto3
+
+                    cm = aioboto3.Session().client('s3', **self._client_kwargs)
+                    self._aio_client = await cm.__aenter__()
+                    self._aio_client_cm = cm
+                    logger.info("R2 async client initialized")
+                except Exception:
+                    logger.exception("Failed to initialize async R2 client; using boto3 in threads")
+                    return None
+        return self._aio_client
+
+    async def aclose(self) -> None:
+        """Cerrar el cliente async (shutdown de la app)"""
+        cm, self._aio_client_cm, self._aio_client = self._aio_client_cm, None, None
+        if cm is not None:
+            try:
+                await cm.__aexit__(None, None, None)
+            except Exception:
+                logger.warning("Error closing async R2 client", exc_info=True)
     
+    async def _upload_object(
+        self,
+        bucket: str,
+        object_key: str,
+        content: UploadContent,
+        content_type: str
+    ) -> None:
+        """Subir un objeto sin bloquear el event loop.
+
+        - buffer (bytes/bytearray/memoryview): un único put_object (aioboto3 si está disponible, si no boto3 en un thread).
+        - archivo abierto: upload_fileobj en un thread; s3transfer lo sube por partes
+          (multipart a partir de 8 MiB, hasta 8 partes en paralelo) leyendo del archivo
+          a medida que envía, así que la memoria queda acotada a las partes en vuelo.
+        Lanza ClientError o R2UploadError.
+        """
+        if isinstance(content, _BUFFER_TYPES):
+            aio_client = await self._get_async_client()
+            if aio_client is not None:
+                await aio_client.put_object(
+                    Bucket=bucket,
+                    Key=object_key,
+                    Body=content,
+                    ContentType=content_type,
+                )
+            else:
+                await asyncio.to_thread(
+                    self.client.put_object,
+                    Bucket=bucket,
+                    Key=object_key,
+                    Body=content,
+                    ContentType=content_type,
+                )
+        else:
+            # boto3 ya está cargado si hay cliente: este import no cuesta nada
+            from boto3.exceptions import S3UploadFailedError
+
+            try:
+                await asyncio.to_thread(
+                    self.client.upload_fileobj,
+                    content,
+                    bucket,
+                    object_key,
+                    ExtraArgs={"ContentType": content_type},
+                    Config=self.transfer_config,
+                )
+            except S3UploadFailedError as ue:
+                raise R2UploadError(str(ue)) from ue
+
     def generate_presigned_url(
         self,
         file_extension: str,
@@ -60,21 +295,13 @@ class R2Service:
         """Generar URL firmada para subida directa a R2"""
         try:
             self._require_client()
-            # Generar nombre único para el archivo
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            unique_id = str(uuid.uuid4())[:8]
-            filename = f"{timestamp}_{unique_id}.{file_extension}"
+            # Generar nombre único (ordenado por tiempo) para el archivo
+            filename = f"{time_ordered_id()}.{file_extension}"
             object_key = f"{folder}/{filename}"
             
-            # Generar URL firmada
-            url = self.client.generate_presigned_url(
-                'put_object',
-                Params={
-                    'Bucket': self.bucket_name,
-                    'Key': object_key,
-                    'ContentType': content_type
-                },
-                ExpiresIn=expiration
+            # Generar URL firmada (localmente; Content-Type queda firmado como con botocore)
+            url = self.presigner.presign(
+                self.bucket_name, object_key, expiration, method="PUT", content_type=content_type
             )
             
             # URL pública del archivo después de la subida
@@ -99,6 +326,37 @@ class R2Service:
         except ClientError:
             return False
     
+    def delete_objects(self, object_keys: List[str]) -> bool:
+        """Eliminar varios objetos de R2 con DeleteObjects (hasta 1000 keys por llamada)
+        
+        Pensado para correr fuera de la request (BackgroundTasks): nunca lanza,
+        registra los errores y devuelve False si alguna key no se pudo eliminar.
+        """
+        keys = list(dict.fromkeys(key for key in object_keys if key))
+        if not keys:
+            return True
+        if not self.client:
+            logger.warning("R2 not configured; skipping deletion of %d object(s)", len(keys))
+            return False
+        
+        ok = True
+        for start in range(0, len(keys), 1000):
+            batch = keys[start:start + 1000]
+            try:
+                response = self.client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+                )
+            except ClientError:
+                logger.exception("Failed to delete %d object(s) from R2", len(batch))
+                ok = False
+                continue
+            errors = response.get("Errors") or []
+            if errors:
+                logger.warning("R2 could not delete %d object(s): %s", len(errors), errors)
+                ok = False
+        return ok
+    
     def get_object_url(self, object_key: str) -> str:
         """Obtener URL pública del objeto"""
         return f"{self.public_url}/{object_key}"
@@ -113,17 +371,10 @@ class R2Service:
             return False
 
     def generate_presigned_get_url(self, object_key: str, expiration: int = 3600) -> str:
-        """Generar URL firmada para descargar un objeto"""
+        """Generar URL firmada para descargar un objeto (firmada localmente, sin botocore)"""
         try:
             self._require_client()
-            return self.client.generate_presigned_url(
-                'get_object',
-                Params={
-                    'Bucket': self.bucket_name,
-                    'Key': object_key,
-                },
-                ExpiresIn=expiration
-            )
+            return self.presigner.presign(self.bucket_name, object_key, expiration)
         except ClientError as e:
             raise Exception(f"Error generating presigned GET URL: {str(e)}")
 
@@ -134,17 +385,9 @@ class R2Service:
         """
         try:
             self._require_client()
-            # NO incluir ContentType en Params para evitar que sea parte de SignedHeaders
-            # Esto previene CORS preflight al hacer PUT desde el browser
-            return self.client.generate_presigned_url(
-                'put_object',
-                Params={
-                    'Bucket': self.public_bucket_name,
-                    'Key': object_key,
-                    # ContentType se puede setear en el PUT sin estar en la firma
-                },
-                ExpiresIn=expiration
-            )
+            # NO incluir Content-Type en la firma (SignedHeaders=host): previene CORS
+            # preflight al hacer PUT desde el browser. Se puede setear en el PUT igual
+            return self.presigner.presign(self.public_bucket_name, object_key, expiration, method="PUT")
         except ClientError as e:
             raise Exception(f"Error generating presigned PUT URL for public bucket: {str(e)}")
 
@@ -156,11 +399,17 @@ class R2Service:
             # Fallback si no hay URL personalizada configurada
             return f"https://{self.public_bucket_name}.r2.dev/{object_key}"
 
-    async def upload_file_to_public_bucket(self, object_key: str, content: bytes, content_type: str) -> tuple[bool, str | None]:
+    async def upload_file_to_public_bucket(
+        self,
+        object_key: str,
+        content: UploadContent,
+        content_type: str
+    ) -> tuple[bool, str | None]:
         """
-        Subir archivo directamente al bucket público para contenido del blog
+        Subir archivo directamente al bucket público para contenido del blog.
+        `content` puede ser bytes o un archivo abierto (p.ej. UploadFile.file): en
+        ese caso se sube en streaming por partes, sin leerlo entero (ver _upload_object).
         """
-        import asyncio
         try:
             self._require_client()
             logger.info("Uploading object to public R2 bucket")
@@ -169,19 +418,14 @@ class R2Service:
                 self.public_bucket_name,
                 object_key,
                 content_type,
-                len(content),
+                len(content) if isinstance(content, _BUFFER_TYPES) else None,
             )
 
-            def _put_object() -> None:
-                self.client.put_object(
-                    Bucket=self.public_bucket_name,
-                    Key=object_key,
-                    Body=content,
-                    ContentType=content_type,
-                )
-
             try:
-                await asyncio.to_thread(_put_object)
+                await self._upload_object(self.public_bucket_name, object_key, content, content_type)
+            except R2UploadError as ue:
+                logger.error("R2 upload_fileobj to public bucket failed: %s key=%s", ue, object_key)
+                return False, f"S3UploadFailedError: {ue}"
             except ClientError as ce:
                 err = ce.response.get("Error", {}) if hasattr(ce, "response") else {}
                 code = err.get("Code")
@@ -209,12 +453,18 @@ class R2Service:
             logger.exception("Unexpected error uploading to public R2 bucket for key=%s", object_key)
             return False, str(e)
 
-    async def upload_file_direct(self, object_key: str, content: bytes, content_type: str) -> tuple[bool, str | None]:
+    async def upload_file_direct(
+        self,
+        object_key: str,
+        content: UploadContent,
+        content_type: str
+    ) -> tuple[bool, str | None]:
         """
-        Subir archivo directamente desde el backend a R2 (asíncrono, no bloqueante),
-        reutilizando el cliente boto3 ya configurado. Devuelve (success, error_message).
+        Subir archivo directamente desde el backend a R2 (asíncrono, no bloqueante).
+        `content` puede ser bytes o un archivo abierto (p.ej. UploadFile.file), que
+        se sube en streaming por partes sin cargarlo en memoria.
+        Devuelve (success, error_message).
         """
-        import asyncio
         try:
             self._require_client()
             logger.info("Uploading object to R2")
@@ -223,19 +473,14 @@ class R2Service:
                 self.bucket_name,
                 object_key,
                 content_type,
-                len(content),
+                len(content) if isinstance(content, _BUFFER_TYPES) else None,
             )
 
-            def _put_object() -> None:
-                self.client.put_object(
-                    Bucket=self.bucket_name,
-                    Key=object_key,
-                    Body=content,
-                    ContentType=content_type,
-                )
-
             try:
-                await asyncio.to_thread(_put_object)
+                await self._upload_object(self.bucket_name, object_key, content, content_type)
+            except R2UploadError as ue:
+                logger.error("R2 upload_fileobj failed: %s key=%s", ue, object_key)
+                return False, f"S3UploadFailedError: {ue}"
             except ClientError as ce:  # type: ignore[name-defined]
                 err = ce.response.get("Error", {}) if hasattr(ce, "response") else {}
                 code = err.get("Code")
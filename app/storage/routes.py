@@ -1,13 +1,104 @@
-from fastapi import APIRouter, HTTPException, status, Depends, UploadFile, File, Form, Query
-from pydantic import BaseModel
-from typing import Optional
+from fastapi import APIRouter, HTTPException, Request, Response, status, Depends, UploadFile, File, Form, Query
+from fastapi.routing import APIRoute
+from pydantic import BaseModel, Field
+from typing import List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+import asyncio
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from secrets import token_hex
+from urllib.parse import urlparse
 
 from app.auth.dependencies import get_current_user
 from app.core.config import settings
 from app.db.models import User
 from app.storage.r2 import r2_service
 
-router = APIRouter()
+# Tamaño máximo de archivo en proxy-upload (500MB)
+MAX_FILE_SIZE = 500 * 1024 * 1024
+# Margen para boundaries y campos del multipart sobre el tamaño del archivo
+_MAX_UPLOAD_BODY = MAX_FILE_SIZE + 1024 * 1024
+
+class _UploadSizeLimitRoute(APIRoute):
+    """Rechaza por Content-Length antes de leer el cuerpo.
+
+    FastAPI lee y parsea el form completo antes de llamar al handler (y a las
+    dependencias), así que el chequeo tiene que ir en el handler de la ruta.
+    """
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def limited_handler(request: Request) -> Response:
+            content_length = request.headers.get("content-length")
+            if content_length and content_length.isdigit() and int(content_length) > _MAX_UPLOAD_BODY:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"Archivo muy grande. Máximo permitido: {MAX_FILE_SIZE // 1024 // 1024}MB"
+                )
+            return await handler(request)
+
+        return limited_handler
+
+router = APIRouter(route_class=_UploadSizeLimitRoute)
+
+# Configurar logger
+logger = logging.getLogger(__name__)
+
+# HEAD concurrentes de /file-info/batch: pool propio (no compite con el threadpool
+# de FastAPI) y menor que el pool de conexiones del cliente S3
+FILE_INFO_BATCH_MAX_KEYS = 100
+_head_executor = ThreadPoolExecutor(
+    max_workers=min(16, settings.R2_MAX_POOL_CONNECTIONS),
+    thread_name_prefix="r2-head"
+)
+
+# Extensiones permitidas en upload-url
+ALLOWED_UPLOAD_EXTENSIONS = frozenset({
+    'jpg', 'jpeg', 'png', 'gif', 'webp',  # Imágenes
+    'pdf', 'doc', 'docx',                  # Documentos
+    'mp4', 'mov', 'avi',                   # Videos
+})
+
+# Nombres de archivos subidos: "<YYYYmmdd_HHMMSS>_<8 hex>.<ext>"
+_KEY_TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+
+# Prefijo "<bucket>/" que algunas URLs guardadas traen delante del object key
+_BUCKET_PREFIX = f"{settings.R2_BUCKET_NAME}/"
+
+# Cache LRU de URLs de descarga firmadas: {object_key: (expira_en, url)}.
+# Se firman por el doble del TTL del cache: una URL servida desde cache siempre
+# tiene al menos DOWNLOAD_URL_TTL_SECONDS de validez por delante
+DOWNLOAD_URL_TTL_SECONDS = 3600
+DOWNLOAD_URL_CACHE_MAXSIZE = 10_000
+_download_url_cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+_download_url_lock = threading.Lock()
+
+def _make_object_key(folder: str, filename: str) -> Tuple[str, str]:
+    """Key único para un archivo subido: ("<folder>/<timestamp>_<id>.<ext>", "<timestamp>_<id>.<ext>")"""
+    _, dot, extension = filename.rpartition('.')
+    name = f"{datetime.now().strftime(_KEY_TIMESTAMP_FORMAT)}_{token_hex(4)}.{extension if dot else ''}"
+    return f"{folder}/{name}", name
+
+def _cached_download_url(key: str) -> str:
+    now = time.monotonic()
+    with _download_url_lock:
+        cached = _download_url_cache.get(key)
+        if cached and cached[0] > now:
+            _download_url_cache.move_to_end(key)
+            return cached[1]
+    
+    url = r2_service.generate_presigned_get_url(key, expiration=2 * DOWNLOAD_URL_TTL_SECONDS)
+    with _download_url_lock:
+        _download_url_cache[key] = (now + DOWNLOAD_URL_TTL_SECONDS, url)
+        _download_url_cache.move_to_end(key)
+        while len(_download_url_cache) > DOWNLOAD_URL_CACHE_MAXSIZE:
+            _download_url_cache.popitem(last=False)
+    return url
 
 class UploadUrlRequest(BaseModel):
     filename: str
@@ -23,6 +114,24 @@ class UploadUrlResponse(BaseModel):
 class DownloadUrlResponse(BaseModel):
     download_url: str
 
+class FileInfoBatchRequest(BaseModel):
+    object_keys: List[str] = Field(..., min_length=1, max_length=FILE_INFO_BATCH_MAX_KEYS)
+
+class FileInfoResponse(BaseModel):
+    object_key: str
+    public_url: Optional[str] = None
+    exists: bool
+
+class ProxyUploadResponse(BaseModel):
+    public_url: str
+    object_key: str
+    filename: str
+    content_type: Optional[str] = None
+    size: int
+
+class MessageResponse(BaseModel):
+    message: str
+
 @router.post("/upload-url", response_model=UploadUrlResponse)
 async def get_upload_url(
     request: UploadUrlRequest,
@@ -31,16 +140,10 @@ async def get_upload_url(
     """Generar URL firmada para subida de archivos a R2"""
     try:
         # Extraer extensión del archivo
-        file_extension = request.filename.split('.')[-1].lower()
+        file_extension = request.filename.rpartition('.')[2].lower()
         
         # Validar tipos de archivo permitidos
-        allowed_extensions = {
-            'jpg', 'jpeg', 'png', 'gif', 'webp',  # Imágenes
-            'pdf', 'doc', 'docx',                  # Documentos
-            'mp4', 'mov', 'avi'                    # Videos (si los necesitas)
-        }
-        
-        if file_extension not in allowed_extensions:
+        if file_extension not in ALLOWED_UPLOAD_EXTENSIONS:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"Tipo de archivo no permitido: .{file_extension}"
@@ -55,20 +158,25 @@ async def get_upload_url(
         
         return UploadUrlResponse(**result)
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error generando URL de subida: {str(e)}"
         )
 
-@router.delete("/file/{object_key:path}")
+@router.delete("/file/{object_key:path}", response_model=MessageResponse)
 async def delete_file(
     object_key: str,
     current_user: User = Depends(get_current_user)
 ):
     """Eliminar archivo de R2"""
     try:
-        success = r2_service.delete_object(object_key)
+        # boto3 es bloqueante: el DELETE a R2 va en un thread, fuera del event loop
+        success = await asyncio.to_thread(r2_service.delete_object, object_key)
+        with _download_url_lock:
+            _download_url_cache.pop(object_key, None)
         
         if not success:
             raise HTTPException(
@@ -78,20 +186,24 @@ async def delete_file(
         
         return {"message": "Archivo eliminado exitosamente"}
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error eliminando archivo: {str(e)}"
         )
 
-@router.get("/file-info/{object_key:path}")
+@router.get("/file-info/{object_key:path}", response_model=FileInfoResponse)
 async def get_file_info(
     object_key: str,
     current_user: User = Depends(get_current_user)
 ):
     """Obtener información de un archivo en R2"""
     try:
-        exists = r2_service.check_object_exists(object_key)
+        # Único round-trip: HEAD a R2 en un thread (boto3 es bloqueante); la URL se
+        # arma localmente
+        exists = await asyncio.to_thread(r2_service.check_object_exists, object_key)
         
         if not exists:
             raise HTTPException(
@@ -107,12 +219,44 @@ async def get_file_info(
             "exists": True
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error obteniendo información del archivo: {str(e)}"
         )
 
+@router.post("/file-info/batch", response_model=List[FileInfoResponse])
+async def get_files_info_batch(
+    request: FileInfoBatchRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """Verificar varios archivos en R2 a la vez (HEAD en paralelo: ~1 RTT en lugar de N)"""
+    try:
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(*(
+            loop.run_in_executor(_head_executor, r2_service.check_object_exists, key)
+            for key in request.object_keys
+        ))
+        
+        return [
+            FileInfoResponse(
+                object_key=key,
+                public_url=r2_service.get_object_url(key) if exists else None,
+                exists=exists
+            )
+            for key, exists in zip(request.object_keys, results)
+        ]
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error obteniendo información de los archivos: {str(e)}"
+        )
+
 @router.get("/download-url", response_model=DownloadUrlResponse)
 async def get_download_url(
     object_key: str = Query(..., description="Key del objeto en R2"),
@@ -122,25 +266,23 @@ async def get_download_url(
     try:
         # Normalizar: si recibimos una URL completa, extraer el path
         key = object_key
-        if key.startswith("http://") or key.startswith("https://"):
-            from urllib.parse import urlparse
-            parsed = urlparse(key)
-            key = parsed.path.lstrip('/')
+        if key.startswith(("http://", "https://")):
+            key = urlparse(key).path.lstrip('/')
         # Si incluye el nombre del bucket como prefijo, quitarlo
-        bucket_prefix = f"{settings.R2_BUCKET_NAME}/"
-        if key.startswith(bucket_prefix):
-            key = key[len(bucket_prefix):]
+        key = key.removeprefix(_BUCKET_PREFIX)
 
-        # Generar URL firmada directamente; si el objeto no existe, el GET firmando fallará
-        url = r2_service.generate_presigned_get_url(key)
+        # URL firmada (cacheada); si el objeto no existe, el GET firmado fallará
+        url = _cached_download_url(key)
         return {"download_url": url}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error generando URL de descarga: {str(e)}"
         )
 
-@router.post("/proxy-upload")
+@router.post("/proxy-upload", response_model=ProxyUploadResponse)
 async def proxy_upload(
     file: UploadFile = File(...),
     folder: str = Form("uploads"),
@@ -154,40 +296,28 @@ async def proxy_upload(
     - Para otros folders: sube al bucket privado con URLs presignadas
     """
     try:
-        # Validar tamaño del archivo (500MB máximo)
-        MAX_FILE_SIZE = 500 * 1024 * 1024  # 500MB
-        file_size = 0
-        
         # Generar nombre único para el archivo
-        from datetime import datetime
-        import uuid
-        
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_id = str(uuid.uuid4())[:8]
-        file_extension = file.filename.split('.')[-1] if '.' in file.filename else ''
-        object_key = f"{folder}/{timestamp}_{unique_id}.{file_extension}"
+        object_key, stored_filename = _make_object_key(folder, file.filename)
         
-        print(f"🚀 Starting upload for {file.filename} -> {object_key}")
+        logger.info("Starting upload for %s -> %s", file.filename, object_key)
         
-        # Leer contenido del archivo en chunks para archivos grandes
-        content = bytearray()
-        chunk_size = 8192  # 8KB chunks
+        # Starlette ya volcó el archivo a su archivo temporal (SpooledTemporaryFile):
+        # se toma el tamaño de ahí y se sube en streaming desde ese archivo (multipart
+        # por partes de 8 MiB), sin acumular el contenido en memoria
+        file_size = file.size
+        if file_size is None:
+            file_size = file.file.seek(0, os.SEEK_END)
+            file.file.seek(0)
         
-        while True:
-            chunk = await file.read(chunk_size)
-            if not chunk:
-                break
-            content.extend(chunk)
-            file_size += len(chunk)
-            
-            # Verificar límite de tamaño
-            if file_size > MAX_FILE_SIZE:
-                raise HTTPException(
-                    status_code=413, 
-                    detail=f"Archivo muy grande. Máximo permitido: {MAX_FILE_SIZE // 1024 // 1024}MB"
-                )
+        # Verificar límite de tamaño (el Content-Length ya se validó en la ruta;
+        # esto cubre clientes que no lo envían o envían uno falso)
+        if file_size > MAX_FILE_SIZE:
+            raise HTTPException(
+                status_code=413, 
+                detail=f"Archivo muy grande. Máximo permitido: {MAX_FILE_SIZE // 1024 // 1024}MB"
+            )
         
-        print(f"📁 File read complete: {file_size / 1024 / 1024:.1f}MB")
+        logger.debug("File received: %d bytes", file_size)
         
         # Detectar si es una portada de curso (folder 'courses')
         # Las portadas deben estar en bucket público para acceso permanente
@@ -195,40 +325,40 @@ async def proxy_upload(
         
         if is_course_cover:
             # Subir al bucket PÚBLICO (sin expiración de URL)
-            print(f"☁️ Uploading to PUBLIC R2 bucket...")
+            logger.debug("Uploading to public R2 bucket")
             success, public_url = await r2_service.upload_file_to_public_bucket(
                 object_key=object_key,
-                content=bytes(content),
+                content=file.file,
                 content_type=file.content_type or 'application/octet-stream'
             )
             
             if not success:
-                print(f"❌ Public R2 upload failed: {public_url}")
+                logger.error("Public R2 upload failed for %s: %s", object_key, public_url)
                 raise HTTPException(status_code=500, detail=f"Failed to upload file to public R2: {public_url}")
             
-            print(f"✅ PUBLIC R2 upload successful: {public_url}")
+            logger.info("Public R2 upload successful: %s", public_url)
             
             return {
                 "public_url": public_url,
                 "object_key": object_key,
-                "filename": f"{timestamp}_{unique_id}.{file_extension}",
+                "filename": stored_filename,
                 "content_type": file.content_type,
                 "size": file_size
             }
         else:
             # Subir al bucket PRIVADO (con URLs presignadas)
-            print(f"☁️ Uploading to PRIVATE R2 bucket...")
+            logger.debug("Uploading to private R2 bucket")
             success, error_message = await r2_service.upload_file_direct(
                 object_key=object_key,
-                content=bytes(content),
+                content=file.file,
                 content_type=file.content_type or 'application/octet-stream'
             )
             
             if not success:
-                print(f"❌ R2 upload failed: {error_message}")
+                logger.error("R2 upload failed for %s: %s", object_key, error_message)
                 raise HTTPException(status_code=500, detail=f"Failed to upload file to R2: {error_message}")
             
-            print(f"✅ R2 upload successful: {object_key}")
+            logger.info("R2 upload successful: %s", object_key)
             
             # Para archivos privados, generar URL pública directa del bucket
             # Se regenerará con presigned URL cuando se acceda
@@ -237,7 +367,7 @@ async def proxy_upload(
             return {
                 "public_url": public_url,
                 "object_key": object_key,
-                "filename": f"{timestamp}_{unique_id}.{file_extension}",
+                "filename": stored_filename,
                 "content_type": file.content_type,
                 "size": file_size
             }
@@ -245,10 +375,10 @@ async def proxy_upload(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"❌ Upload error: {str(e)}")
+        logger.exception("Upload error")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
-@router.post("/upload-to-public-url")
+@router.post("/upload-to-public-url", response_model=UploadUrlResponse)
 async def get_public_upload_url(
     filename: str = Form(...),
     content_type: str = Form(...),
@@ -261,15 +391,9 @@ async def get_public_upload_url(
     """
     try:
         # Generar nombre único para el archivo
-        from datetime import datetime
-        import uuid
+        object_key, stored_filename = _make_object_key(folder, filename)
         
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_id = str(uuid.uuid4())[:8]
-        file_extension = filename.split('.')[-1] if '.' in filename else ''
-        object_key = f"{folder}/{timestamp}_{unique_id}.{file_extension}"
-        
-        print(f"🚀 Generating PUBLIC presigned URL for {filename} -> {object_key}")
+        logger.debug("Generating public presigned URL for %s -> %s", filename, object_key)
         
         # Generar URL firmada de subida (PUT) al bucket público
         upload_url = r2_service.generate_public_presigned_put_url(
@@ -281,15 +405,17 @@ async def get_public_upload_url(
         # Generar la URL pública final (sin firma)
         public_url = r2_service.get_public_object_url(object_key)
         
-        print(f"✅ Presigned URL generated: {object_key}")
+        logger.debug("Presigned URL generated: %s", object_key)
         
         return {
             "upload_url": upload_url,
             "public_url": public_url,
             "object_key": object_key,
-            "filename": f"{timestamp}_{unique_id}.{file_extension}"
+            "filename": stored_filename
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"❌ Error generating presigned URL: {str(e)}")
+        logger.exception("Error generating presigned URL")
         raise HTTPException(status_code=500, detail=f"Failed to generate upload URL: {str(e)}")
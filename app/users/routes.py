@@ -1,9 +1,10 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Response, status, Query
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import func
 
 from app.db.session import get_db
+from app.core.pagination import encode_cursor, decode_cursor
 from app.auth.dependencies import get_current_user, require_admin
 from app.users.schemas import UserResponse, UserUpdate, RoleResponse, PaginatedUsersResponse
 from app.users.service import UserService, RoleService
@@ -11,6 +12,21 @@ from app.db.models import User, Role, CourseEnrollment
 
 router = APIRouter()
 
+def _user_response(user: User) -> UserResponse:
+    """Armar la respuesta desde un usuario con el rol ya cargado (sin consultas extra)"""
+    return UserResponse(
+        id=user.id,
+        email=user.email,
+        name=user.name,
+        avatar_url=user.avatar_url,
+        google_id=user.google_id,
+        is_active=user.is_active,
+        has_premium_access=user.has_premium_access,
+        role_name=user.role.name,
+        created_at=user.created_at,
+        updated_at=user.updated_at
+    )
+
 @router.get("/debug-users-public")
 async def debug_users_public(db: Session = Depends(get_db)):
     """Debug users - PUBLIC ENDPOINT - TEMPORARY"""
@@ -36,24 +52,11 @@ async def debug_users_public(db: Session = Depends(get_db)):
 
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_profile(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user)
 ):
     """Obtener perfil del usuario actual"""
-    user_with_role = db.query(User).join(User.role).filter(User.id == current_user.id).first()
-    
-    return UserResponse(
-        id=user_with_role.id,
-        email=user_with_role.email,
-        name=user_with_role.name,
-        avatar_url=user_with_role.avatar_url,
-        google_id=user_with_role.google_id,
-        is_active=user_with_role.is_active,
-        has_premium_access=user_with_role.has_premium_access,
-        role_name=user_with_role.role.name,
-        created_at=user_with_role.created_at,
-        updated_at=user_with_role.updated_at
-    )
+    # get_current_user ya cargó al usuario con su rol
+    return _user_response(current_user)
 
 @router.put("/me", response_model=UserResponse)
 async def update_current_user_profile(
@@ -73,20 +76,7 @@ async def update_current_user_profile(
             detail="User not found"
         )
     
-    user_with_role = db.query(User).join(User.role).filter(User.id == updated_user.id).first()
-    
-    return UserResponse(
-        id=user_with_role.id,
-        email=user_with_role.email,
-        name=user_with_role.name,
-        avatar_url=user_with_role.avatar_url,
-        google_id=user_with_role.google_id,
-        is_active=user_with_role.is_active,
-        has_premium_access=user_with_role.has_premium_access,
-        role_name=user_with_role.role.name,
-        created_at=user_with_role.created_at,
-        updated_at=user_with_role.updated_at
-    )
+    return _user_response(updated_user)
 
 @router.get("/admin/stats/")
 async def get_users_stats(
@@ -120,45 +110,32 @@ async def get_users_admin_list(
     """Lista paginada y filtrada de usuarios para admin, sin afectar el endpoint existente.
     Permite filtrar por rol, estado y curso (enrollments) y devuelve metadata de paginación.
     """
-    # 1) Armar query base de IDs filtrados
-    ids_query = db.query(User.id).join(Role)
+    # Query base filtrada. El filtro por curso va como EXISTS (no JOIN): un usuario con
+    # varios enrollments del mismo curso no se duplica ni en la página ni en el total
+    base_query = db.query(User).join(Role)
 
     if role_name:
-        ids_query = ids_query.filter(Role.name == role_name)
+        base_query = base_query.filter(Role.name == role_name)
 
     if is_active is not None:
-        ids_query = ids_query.filter(User.is_active == is_active)
+        base_query = base_query.filter(User.is_active == is_active)
 
     if course_id is not None:
-        ids_query = ids_query.join(CourseEnrollment, CourseEnrollment.user_id == User.id)
-        ids_query = ids_query.filter(CourseEnrollment.course_id == course_id)
-        if has_access is not None:
-            ids_query = ids_query.filter(CourseEnrollment.has_access == has_access)
-
-    # Total optimizado (distinct por posibles joins)
-    total = db.query(func.count(func.distinct(User.id))).select_from(User).join(Role)
-    if role_name:
-        total = total.filter(Role.name == role_name)
-    if is_active is not None:
-        total = total.filter(User.is_active == is_active)
-    if course_id is not None:
-        total = total.join(CourseEnrollment, CourseEnrollment.user_id == User.id)
-        total = total.filter(CourseEnrollment.course_id == course_id)
+        enrollment = db.query(CourseEnrollment.id).filter(
+            CourseEnrollment.user_id == User.id,
+            CourseEnrollment.course_id == course_id
+        )
         if has_access is not None:
-            total = total.filter(CourseEnrollment.has_access == has_access)
-    total = total.scalar() or 0
+            enrollment = enrollment.filter(CourseEnrollment.has_access == has_access)
+        base_query = base_query.filter(enrollment.exists())
 
     # Orden
     order_clause = User.created_at.asc() if order == "asc" else User.created_at.desc()
 
-    # Subquery de ids paginados ya ordenados
-    ids_subq = (
-        ids_query.order_by(order_clause).offset(skip).limit(limit).subquery()
-    )
-
-    # 2) Traer sólo columnas necesarias para respuesta, evitando overhead de ORM completo
+    # Página + total en un solo SELECT: count(*) OVER () se calcula sobre todas las
+    # filas filtradas antes de OFFSET/LIMIT. Sólo columnas necesarias para la respuesta
     rows = (
-        db.query(
+        base_query.with_entities(
             User.id,
             User.email,
             User.name,
@@ -169,13 +146,17 @@ async def get_users_admin_list(
             Role.name.label("role_name"),
             User.created_at,
             User.updated_at,
+            func.count().over().label("total"),
         )
-        .join(Role)
-        .join(ids_subq, ids_subq.c.id == User.id)
         .order_by(order_clause)
+        .offset(skip)
+        .limit(limit)
         .all()
     )
 
+    # Página vacía (skip más allá del final): el total sale de un COUNT aparte
+    total = rows[0].total if rows else (base_query.count() if skip else 0)
+
     users_out: List[UserResponse] = []
     for r in rows:
         users_out.append(UserResponse(
@@ -201,39 +182,34 @@ async def get_users_admin_list(
 
 @router.get("/", response_model=List[UserResponse])
 async def get_users(
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
     role_name: Optional[str] = Query(None),
     is_active: Optional[bool] = Query(None),
+    cursor: Optional[str] = Query(None),
     current_user: User = Depends(require_admin),
     db: Session = Depends(get_db)
 ):
-    """Obtener lista de usuarios (solo admin)"""
+    """Obtener lista de usuarios (solo admin)
+    
+    Más recientes primero. Si la página está completa, el header X-Next-Cursor
+    trae el valor para pedir la siguiente (?cursor=...); skip se mantiene para
+    clientes existentes.
+    """
     users = UserService.get_users(
         db=db,
         skip=skip,
         limit=limit,
         role_name=role_name,
-        is_active=is_active
+        is_active=is_active,
+        cursor=decode_cursor(cursor) if cursor else None
     )
+    next_cursor = encode_cursor(users[-1]) if len(users) == limit else None
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
-    result = []
-    for user in users:
-        user_with_role = db.query(User).join(User.role).filter(User.id == user.id).first()
-        result.append(UserResponse(
-            id=user_with_role.id,
-            email=user_with_role.email,
-            name=user_with_role.name,
-            avatar_url=user_with_role.avatar_url,
-            google_id=user_with_role.google_id,
-            is_active=user_with_role.is_active,
-            has_premium_access=user_with_role.has_premium_access,
-            role_name=user_with_role.role.name,
-            created_at=user_with_role.created_at,
-            updated_at=user_with_role.updated_at
-        ))
-    
-    return result
+    return [_user_response(user) for user in users]
 
 @router.get("/{user_id}", response_model=UserResponse)
 async def get_user_by_id(
@@ -249,20 +225,7 @@ async def get_user_by_id(
             detail="User not found"
         )
     
-    user_with_role = db.query(User).join(User.role).filter(User.id == user.id).first()
-    
-    return UserResponse(
-        id=user_with_role.id,
-        email=user_with_role.email,
-        name=user_with_role.name,
-        avatar_url=user_with_role.avatar_url,
-        google_id=user_with_role.google_id,
-        is_active=user_with_role.is_active,
-        has_premium_access=user_with_role.has_premium_access,
-        role_name=user_with_role.role.name,
-        created_at=user_with_role.created_at,
-        updated_at=user_with_role.updated_at
-    )
+    return _user_response(user)
 
 @router.put("/{user_id}", response_model=UserResponse)
 async def update_user_by_id(
@@ -279,20 +242,7 @@ async def update_user_by_id(
             detail="User not found"
         )
     
-    user_with_role = db.query(User).join(User.role).filter(User.id == updated_user.id).first()
-    
-    return UserResponse(
-        id=user_with_role.id,
-        email=user_with_role.email,
-        name=user_with_role.name,
-        avatar_url=user_with_role.avatar_url,
-        google_id=user_with_role.google_id,
-        is_active=user_with_role.is_active,
-        has_premium_access=user_with_role.has_premium_access,
-        role_name=user_with_role.role.name,
-        created_at=user_with_role.created_at,
-        updated_at=user_with_role.updated_at
-    )
+    return _user_response(updated_user)
 
 @router.delete("/{user_id}")
 async def delete_user_by_id(
@@ -1,15 +1,17 @@
-from typing import List, Optional
-from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy.orm import Session, contains_eager, joinedload
+from sqlalchemy import and_, tuple_
 
 from app.db.models import User, Role
 from app.users.schemas import UserCreate, UserUpdate
+from app.courses.service import CourseService
 
 class UserService:
     @staticmethod
     def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
-        """Obtener usuario por ID"""
-        return db.query(User).filter(User.id == user_id).first()
+        """Obtener usuario por ID (con su rol en el mismo SELECT)"""
+        return db.query(User).options(joinedload(User.role)).filter(User.id == user_id).first()
     
     @staticmethod
     def get_user_by_email(db: Session, email: str) -> Optional[User]:
@@ -27,10 +29,16 @@ class UserService:
         skip: int = 0, 
         limit: int = 100,
         role_name: Optional[str] = None,
-        is_active: Optional[bool] = None
+        is_active: Optional[bool] = None,
+        cursor: Optional[Tuple[datetime, int]] = None
     ) -> List[User]:
-        """Obtener lista de usuarios con filtros"""
-        query = db.query(User).join(Role)
+        """Obtener lista de usuarios con filtros (rol cargado desde el mismo JOIN)
+        
+        Ordenada por (created_at DESC, id DESC). Con cursor (created_at, id) del
+        último usuario de la página anterior se pagina por keyset sobre
+        ix_users_created_at_id en lugar de OFFSET.
+        """
+        query = db.query(User).join(Role).options(contains_eager(User.role))
         
         if role_name:
             query = query.filter(Role.name == role_name)
@@ -38,7 +46,14 @@ class UserService:
         if is_active is not None:
             query = query.filter(User.is_active == is_active)
         
-        return query.offset(skip).limit(limit).all()
+        if cursor is not None:
+            query = query.filter(tuple_(User.created_at, User.id) < tuple_(*cursor))
+        
+        query = query.order_by(User.created_at.desc(), User.id.desc())
+        
+        if cursor is None and skip:
+            query = query.offset(skip)
+        return query.limit(limit).all()
     
     @staticmethod
     def get_users_count(db: Session) -> int:
@@ -56,17 +71,21 @@ class UserService:
     
     @staticmethod
     def update_user(db: Session, user_id: int, user_data: UserUpdate) -> Optional[User]:
-        """Actualizar usuario"""
-        user = db.query(User).filter(User.id == user_id).first()
+        """Actualizar usuario (devuelve el usuario con su rol, que puede haber cambiado)"""
+        user = db.get(User, user_id)
         if not user:
             return None
         
-        for field, value in user_data.model_dump(exclude_unset=True).items():
+        changes = user_data.model_dump(exclude_unset=True)
+        for field, value in changes.items():
             setattr(user, field, value)
         
         db.commit()
-        db.refresh(user)
-        return user
+        # El acceso cacheado depende del rol (admin) y del estado: descartarlo si cambiaron
+        if "role_id" in changes or "is_active" in changes:
+            CourseService.invalidate_user_access(user_id)
+        # En lugar de refresh + lazy load del rol: un SELECT con el rol incluido
+        return UserService.get_user_by_id(db, user_id)
     
     @staticmethod
     def delete_user(db: Session, user_id: int) -> bool:
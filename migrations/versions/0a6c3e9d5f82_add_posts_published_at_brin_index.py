@@ -0,0 +1,31 @@
+"""add_posts_published_at_brin_index
+
+Revision ID: 0a6c3e9d5f82
+Revises: f5b2d8e4a071
+Create Date: 2026-10-16 15:48:33.120984
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a6c3e9d5f82'
+down_revision = 'f5b2d8e4a071'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Rangos por fecha de publicación (append-only en la práctica)
+    op.create_index(
+        'ix_posts_published_at_brin',
+        'posts',
+        ['published_at'],
+        unique=False,
+        postgresql_using='brin',
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_posts_published_at_brin', table_name='posts')
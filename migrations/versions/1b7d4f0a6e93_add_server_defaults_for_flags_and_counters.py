@@ -0,0 +1,56 @@
+"""add_server_defaults_for_flags_and_counters
+
+Revision ID: 1b7d4f0a6e93
+Revises: 0a6c3e9d5f82
+Create Date: 2026-10-16 16:10:57.436218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b7d4f0a6e93'
+down_revision = '0a6c3e9d5f82'
+branch_labels = None
+depends_on = None
+
+
+# (tabla, columna, default) para booleanos y contadores que solo tenían default en Python
+SERVER_DEFAULTS = [
+    ('users', 'is_active', 'true'),
+    ('users', 'has_premium_access', 'false'),
+    ('posts', 'is_published', 'false'),
+    ('posts', 'is_featured', 'false'),
+    ('posts', 'views_count', '0'),
+    ('courses', 'is_published', 'false'),
+    ('courses', 'is_premium', 'true'),
+    ('chapters', 'is_published', 'false'),
+    ('lessons', 'is_published', 'false'),
+    ('lessons', 'is_free', 'false'),
+    ('lessons', 'can_download', 'false'),
+    ('lesson_progress', 'is_completed', 'false'),
+    ('lesson_progress', 'progress_percentage', '0'),
+    ('lesson_progress', 'time_spent_seconds', '0'),
+    ('lesson_progress', 'last_position_seconds', '0'),
+    ('course_enrollments', 'has_access', 'false'),
+    ('course_enrollments', 'progress_percentage', '0'),
+    ('course_enrollments', 'completed_lessons', '0'),
+    ('course_enrollments', 'total_time_spent_seconds', '0'),
+    ('homepage_content', 'order_index', '0'),
+    ('homepage_content', 'is_active', 'true'),
+    ('homepage_gallery', 'order_index', '0'),
+    ('homepage_gallery', 'is_featured', 'false'),
+    ('homepage_gallery', 'is_active', 'true'),
+]
+
+
+def upgrade() -> None:
+    # SET DEFAULT solo toca el catálogo: no reescribe filas ni las valida
+    for table, column, default in SERVER_DEFAULTS:
+        op.alter_column(table, column, server_default=sa.text(default))
+
+
+def downgrade() -> None:
+    for table, column, _ in reversed(SERVER_DEFAULTS):
+        op.alter_column(table, column, server_default=None)
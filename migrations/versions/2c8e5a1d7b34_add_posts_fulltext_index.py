@@ -0,0 +1,30 @@
+"""add_posts_fulltext_index
+
+Revision ID: 2c8e5a1d7b34
+Revises: 1b7d4f0a6e93
+Create Date: 2026-10-16 16:42:18.775031
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2c8e5a1d7b34'
+down_revision = '1b7d4f0a6e93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY no bloquea escrituras, pero no puede correr dentro de una transacción
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_posts_fts ON posts "
+            "USING gin (to_tsvector('spanish'::regconfig, title || ' ' || content))"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_posts_fts")
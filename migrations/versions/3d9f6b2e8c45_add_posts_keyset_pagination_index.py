@@ -0,0 +1,30 @@
+"""add_posts_keyset_pagination_index
+
+Revision ID: 3d9f6b2e8c45
+Revises: 2c8e5a1d7b34
+Create Date: 2026-10-16 17:05:41.268507
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3d9f6b2e8c45'
+down_revision = '2c8e5a1d7b34'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Listado público por keyset: WHERE is_published ORDER BY created_at DESC, id DESC
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_posts_pub_created_id "
+            "ON posts (is_published, created_at DESC, id DESC)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_posts_pub_created_id")
@@ -0,0 +1,39 @@
+"""add_posts_listing_covering_index
+
+Revision ID: 4e0a7c3f9d56
+Revises: 3d9f6b2e8c45
+Create Date: 2026-10-16 17:41:09.532816
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e0a7c3f9d56'
+down_revision = '3d9f6b2e8c45'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Listado público: parcial (sin borradores) y cubriente para index-only scan.
+    # Reemplaza a ix_posts_pub_created_id, que solo servía a esta misma consulta
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_posts_listing "
+            "ON posts (created_at DESC, id DESC) "
+            "INCLUDE (title, author_id, updated_at, is_published) "
+            "WHERE is_published = true"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_posts_pub_created_id")
+    op.execute("ANALYZE posts")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_posts_pub_created_id "
+            "ON posts (is_published, created_at DESC, id DESC)"
+        )
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_posts_listing")
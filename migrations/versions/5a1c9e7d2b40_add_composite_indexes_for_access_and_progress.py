@@ -0,0 +1,42 @@
+"""add_composite_indexes_for_access_and_progress
+
+Revision ID: 5a1c9e7d2b40
+Revises: 3903148d3268
+Create Date: 2026-10-16 10:12:31.482915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5a1c9e7d2b40'
+down_revision = '3903148d3268'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Verificación de acceso: WHERE user_id = ? AND course_id = ? AND has_access = true
+    op.create_index(
+        'ix_course_enrollments_user_id_course_id_access',
+        'course_enrollments',
+        ['user_id', 'course_id'],
+        unique=False,
+        postgresql_where=sa.text('has_access = true'),
+    )
+    # Conteo de lecciones publicadas por curso
+    op.create_index('ix_lessons_course_id_is_published', 'lessons', ['course_id', 'is_published'], unique=False)
+    # Progreso del usuario por lección
+    op.create_index(
+        'ix_lesson_progress_user_id_lesson_id_is_completed',
+        'lesson_progress',
+        ['user_id', 'lesson_id', 'is_completed'],
+        unique=False,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_lesson_progress_user_id_lesson_id_is_completed', table_name='lesson_progress')
+    op.drop_index('ix_lessons_course_id_is_published', table_name='lessons')
+    op.drop_index('ix_course_enrollments_user_id_course_id_access', table_name='course_enrollments')
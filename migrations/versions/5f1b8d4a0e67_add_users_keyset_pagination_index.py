@@ -0,0 +1,30 @@
+"""add_users_keyset_pagination_index
+
+Revision ID: 5f1b8d4a0e67
+Revises: 4e0a7c3f9d56
+Create Date: 2026-10-16 18:22:37.904175
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f1b8d4a0e67'
+down_revision = '4e0a7c3f9d56'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Listado de usuarios por keyset: ORDER BY created_at DESC, id DESC
+    with op.get_context().autocommit_block():
+        op.execute(
+            "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_users_created_at_id "
+            "ON users (created_at DESC, id DESC)"
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.execute("DROP INDEX CONCURRENTLY IF EXISTS ix_users_created_at_id")
@@ -0,0 +1,43 @@
+"""unique_course_enrollment_per_user_course
+
+Revision ID: 8e3b61f0c7a2
+Revises: 5a1c9e7d2b40
+Create Date: 2026-10-16 12:41:08.203117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e3b61f0c7a2'
+down_revision = '5a1c9e7d2b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Eliminar enrollments duplicados por (user_id, course_id): se conserva el que
+    # tiene acceso y, entre iguales, el más reciente
+    op.execute(
+        """
+        DELETE FROM course_enrollments a
+        USING course_enrollments b
+        WHERE a.user_id = b.user_id
+          AND a.course_id = b.course_id
+          AND a.course_id <> 0
+          AND (COALESCE(b.has_access, false), b.id) > (COALESCE(a.has_access, false), a.id)
+        """
+    )
+    # Un enrollment por usuario y curso (course_id = 0 registra accesos premium globales)
+    op.create_index(
+        'uq_course_enrollments_user_id_course_id',
+        'course_enrollments',
+        ['user_id', 'course_id'],
+        unique=True,
+        postgresql_where=sa.text('course_id <> 0'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_course_enrollments_user_id_course_id', table_name='course_enrollments')
@@ -0,0 +1,49 @@
+"""add_homepage_composite_indexes
+
+Revision ID: b27d4c9a1e63
+Revises: 8e3b61f0c7a2
+Create Date: 2026-10-16 13:20:44.517302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b27d4c9a1e63'
+down_revision = '8e3b61f0c7a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Contenido por sección: WHERE section = ? AND is_active ORDER BY order_index
+    op.create_index(
+        'ix_homepage_content_section_active_order',
+        'homepage_content',
+        ['section', 'is_active', 'order_index'],
+        unique=False,
+        postgresql_using='btree',
+    )
+    # Galería (destacados): WHERE is_active [AND is_featured] ORDER BY order_index
+    op.create_index(
+        'ix_homepage_gallery_active_featured_order',
+        'homepage_gallery',
+        ['is_active', 'is_featured', 'order_index'],
+        unique=False,
+        postgresql_using='btree',
+    )
+    # Galería por categoría: WHERE category = ? AND is_active ORDER BY order_index
+    op.create_index(
+        'ix_homepage_gallery_category_active_order',
+        'homepage_gallery',
+        ['category', 'is_active', 'order_index'],
+        unique=False,
+        postgresql_using='btree',
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_homepage_gallery_category_active_order', table_name='homepage_gallery')
+    op.drop_index('ix_homepage_gallery_active_featured_order', table_name='homepage_gallery')
+    op.drop_index('ix_homepage_content_section_active_order', table_name='homepage_content')
@@ -0,0 +1,25 @@
+"""add_post_tags_reverse_index
+
+Revision ID: c4f8a2d6e915
+Revises: b27d4c9a1e63
+Create Date: 2026-10-16 14:02:17.684530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f8a2d6e915'
+down_revision = 'b27d4c9a1e63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Búsqueda inversa tag -> posts (la PK (post_id, tag_id) solo cubre post -> tags)
+    op.create_index('ix_post_tags_tag_post', 'post_tags', ['tag_id', 'post_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_post_tags_tag_post', table_name='post_tags')
@@ -0,0 +1,53 @@
+"""add_foreign_key_indexes
+
+Revision ID: d91e5b3a7c28
+Revises: c4f8a2d6e915
+Create Date: 2026-10-16 14:31:52.907164
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd91e5b3a7c28'
+down_revision = 'c4f8a2d6e915'
+branch_labels = None
+depends_on = None
+
+
+# (índice, tabla, columna) para FKs del lado hijo sin índice propio.
+# lessons.course_id y lesson_progress.user_id ya son columna líder de un índice compuesto.
+FK_INDEXES = [
+    ('ix_posts_author_id', 'posts', 'author_id'),
+    ('ix_posts_category_id', 'posts', 'category_id'),
+    ('ix_lessons_chapter_id', 'lessons', 'chapter_id'),
+    ('ix_lesson_progress_lesson_id', 'lesson_progress', 'lesson_id'),
+    ('ix_course_enrollments_user_id', 'course_enrollments', 'user_id'),
+    ('ix_course_enrollments_course_id', 'course_enrollments', 'course_id'),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY no bloquea escrituras, pero no puede correr dentro de una transacción
+    with op.get_context().autocommit_block():
+        for name, table, column in FK_INDEXES:
+            op.create_index(
+                name,
+                table,
+                [column],
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(FK_INDEXES):
+            op.drop_index(
+                name,
+                table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
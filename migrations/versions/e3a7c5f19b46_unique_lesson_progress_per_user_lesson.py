@@ -0,0 +1,39 @@
+"""unique_lesson_progress_per_user_lesson
+
+Revision ID: e3a7c5f19b46
+Revises: d91e5b3a7c28
+Create Date: 2026-10-16 15:04:26.318840
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e3a7c5f19b46'
+down_revision = 'd91e5b3a7c28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Eliminar progresos duplicados por (user_id, lesson_id): se conserva el
+    # completado y, entre iguales, el más reciente
+    op.execute(
+        """
+        DELETE FROM lesson_progress a
+        USING lesson_progress b
+        WHERE a.user_id = b.user_id
+          AND a.lesson_id = b.lesson_id
+          AND (COALESCE(b.is_completed, false), b.id) > (COALESCE(a.is_completed, false), a.id)
+        """
+    )
+    op.create_unique_constraint(
+        'uq_lesson_progress_user_lesson',
+        'lesson_progress',
+        ['user_id', 'lesson_id'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_lesson_progress_user_lesson', 'lesson_progress', type_='unique')
@@ -0,0 +1,31 @@
+"""add_featured_gallery_partial_index
+
+Revision ID: f5b2d8e4a071
+Revises: e3a7c5f19b46
+Create Date: 2026-10-16 15:22:09.541773
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5b2d8e4a071'
+down_revision = 'e3a7c5f19b46'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Galería destacada: WHERE is_active AND is_featured ORDER BY order_index
+    op.create_index(
+        'ix_gallery_featured_order',
+        'homepage_gallery',
+        ['order_index'],
+        unique=False,
+        postgresql_where=sa.text('is_active AND is_featured'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_gallery_featured_order', table_name='homepage_gallery')
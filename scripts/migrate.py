@@ -0,0 +1,18 @@
+#!/usr/bin/env python3
+"""
+Correr las migraciones de Alembic una sola vez (paso de pre-deploy).
+
+Uso: python -m scripts.migrate  (o python scripts/migrate.py) desde la raíz del proyecto
+"""
+import logging
+import os
+import sys
+
+# Agregar la raíz del proyecto al Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.db.migrate import run_db_migrations
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(0 if run_db_migrations() else 1)